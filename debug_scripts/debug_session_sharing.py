@@ -7,80 +7,117 @@ import asyncio
 import httpx
 import json
 import time
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Dict, Union
+
+from diag_common import JSON_HEADERS, json_dumps, json_loads
+
+try:
+    from httpx_sse import EventSource
+except ImportError:  # optional; fall back to the built-in event framing below
+    EventSource = None
 
 BASE_URL = "http://localhost:8000"
 
-async def send_message_to_agent(agent_name: str, message: str, session_id: str) -> Dict[str, Any]:
+# One pooled client is shared by the health check and every agent message
+CLIENT_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+
+def create_client() -> httpx.AsyncClient:
+    """Create the shared keep-alive client for the A2A server."""
+    return httpx.AsyncClient(base_url=BASE_URL, timeout=30, limits=CLIENT_LIMITS)
+
+async def iter_sse_data(client: httpx.AsyncClient, url: str, payload: bytes) -> AsyncIterator[Union[str, bytes]]:
+    """POST a JSON-RPC payload and yield the data field of each SSE event.
+    
+    A non-SSE reply is yielded whole, as a single JSON body.
+    """
+    async with client.stream("POST", url, content=payload, headers=JSON_HEADERS) as stream_response:
+        # tasks/stream may answer with a plain JSON body rather than SSE
+        if not stream_response.headers.get("content-type", "").startswith("text/event-stream"):
+            yield await stream_response.aread()
+            return
+        
+        if EventSource is not None:
+            async for sse in EventSource(stream_response).aiter_sse():
+                yield sse.data
+            return
+        
+        # Chunks need not line up with events: buffer until the blank line
+        # that ends each SSE event, then join its data lines
+        buf = bytearray()
+        async for chunk in stream_response.aiter_bytes():
+            buf += chunk.replace(b"\r", b"")
+            while (end := buf.find(b"\n\n")) != -1:
+                event = bytes(buf[:end])
+                del buf[:end + 2]
+                data = [line[5:].strip() for line in event.split(b"\n") if line.startswith(b"data:")]
+                if data:
+                    yield b"\n".join(data)
+
+async def send_message_to_agent(client: httpx.AsyncClient, agent_name: str, message: str,
+                                session_id: str) -> Dict[str, Any]:
     """Send a message to an agent and get the response."""
     
-    async with httpx.AsyncClient() as client:
-        # Send the message
-        response = await client.post(
-            f"{BASE_URL}/{agent_name}/rpc",
-            json={
-                "jsonrpc": "2.0",
-                "method": "tasks/send",
-                "params": {
-                    "message": {
-                        "parts": [{"type": "text", "text": message}],
-                        "role": "user"
-                    },
-                    "session_id": session_id
+    # Send the message
+    response = await client.post(
+        f"/{agent_name}/rpc",
+        content=json_dumps({
+            "jsonrpc": "2.0",
+            "method": "tasks/send",
+            "params": {
+                "message": {
+                    "parts": [{"type": "text", "text": message}],
+                    "role": "user"
                 },
-                "id": "test_1"
+                "session_id": session_id
             },
-            headers={"Content-Type": "application/json"}
-        )
-        
-        if response.status_code != 200:
-            return {"error": f"HTTP {response.status_code}: {response.text}"}
-        
-        result = response.json()
-        print(f"🔍 Response from {agent_name}: {result}")
-        
-        if "error" in result:
-            return {"error": result["error"]}
-        
-        if "result" not in result or "task_id" not in result["result"]:
-            return {"error": f"Unexpected response format: {result}"}
-        
-        task_id = result["result"]["task_id"]
-        
-        # Stream the response
-        response_parts = []
-        async with client.stream(
-            "POST",
-            f"{BASE_URL}/{agent_name}",
-            json={
-                "jsonrpc": "2.0", 
-                "method": "tasks/stream",
-                "params": {"task_id": task_id},
-                "id": "stream_1"
-            },
-            headers={"Content-Type": "application/json"}
-        ) as stream_response:
-            async for chunk in stream_response.aiter_text():
-                if chunk.strip():
-                    try:
-                        data = json.loads(chunk.strip())
-                        if "result" in data and "artifact" in data["result"]:
-                            artifact = data["result"]["artifact"]
-                            if artifact and "parts" in artifact:
-                                for part in artifact["parts"]:
-                                    if part.get("type") == "text" and part.get("text"):
-                                        response_parts.append(part["text"])
-                    except json.JSONDecodeError:
-                        continue
-        
-        return {
-            "agent": agent_name,
-            "message": message,
-            "response": "".join(response_parts),
-            "session_id": session_id
-        }
+            "id": "test_1"
+        }),
+        headers=JSON_HEADERS
+    )
+    
+    if response.status_code != 200:
+        return {"error": f"HTTP {response.status_code}: {response.text}"}
+    
+    result = json_loads(response.content)
+    print(f"🔍 Response from {agent_name}: {result}")
+    
+    if "error" in result:
+        return {"error": result["error"]}
+    
+    if "result" not in result or "task_id" not in result["result"]:
+        return {"error": f"Unexpected response format: {result}"}
+    
+    task_id = result["result"]["task_id"]
+    
+    # Stream the response
+    response_parts = []
+    payload = json_dumps({
+        "jsonrpc": "2.0", 
+        "method": "tasks/stream",
+        "params": {"task_id": task_id},
+        "id": "stream_1"
+    })
+    async for raw in iter_sse_data(client, f"/{agent_name}", payload):
+        try:
+            data = json_loads(raw)
+        except json.JSONDecodeError:
+            print(f"⚠️  Unparseable SSE data: {raw[:200]!r}")
+            continue
+        if "result" in data and "artifact" in data["result"]:
+            artifact = data["result"]["artifact"]
+            if artifact and "parts" in artifact:
+                for part in artifact["parts"]:
+                    if part.get("type") == "text" and part.get("text"):
+                        response_parts.append(part["text"])
+    
+    return {
+        "agent": agent_name,
+        "message": message,
+        "response": "".join(response_parts),
+        "session_id": session_id
+    }
 
-async def test_session_sharing():
+async def test_session_sharing(client: httpx.AsyncClient):
     """Test that session sharing works between chuk_pirate and chuk_chef."""
     
     # Use a unique session ID for this test
@@ -90,6 +127,7 @@ async def test_session_sharing():
     # Step 1: Tell the pirate agent your name
     print("\n1️⃣ Telling chuk_pirate: 'my name is chukkie'")
     pirate_result = await send_message_to_agent(
+        client,
         "chuk_pirate", 
         "my name is chukkie", 
         test_session_id
@@ -107,6 +145,7 @@ async def test_session_sharing():
     # Step 2: Ask the chef agent what your name is
     print("\n2️⃣ Asking chuk_chef: 'what's my name?'")
     chef_result = await send_message_to_agent(
+        client,
         "chuk_chef", 
         "what's my name?", 
         test_session_id
@@ -138,61 +177,68 @@ async def test_session_sharing():
     
     return success
 
-async def test_agent_health():
+async def test_agent_health(client: httpx.AsyncClient):
     """Test that both agents are healthy and configured correctly."""
     
     print("🔍 Checking agent health and configuration...")
     
-    async with httpx.AsyncClient() as client:
-        # Check server status
-        try:
-            response = await client.post(
-                f"{BASE_URL}/rpc",
-                json={
-                    "jsonrpc": "2.0",
-                    "method": "handlers/status",
-                    "params": {},
-                    "id": "health_check"
-                }
-            )
-            
-            print(f"🔍 Server response status: {response.status_code}")
+    # Check server status
+    try:
+        response = await client.post(
+            "/rpc",
+            content=json_dumps({
+                "jsonrpc": "2.0",
+                "method": "handlers/status",
+                "params": {},
+                "id": "health_check"
+            }),
+            headers=JSON_HEADERS
+        )
+        
+        print(f"🔍 Server response status: {response.status_code}")
+        
+        if response.status_code == 200:
+            result = json_loads(response.content)
+            print(f"🔍 Server response: {result}")
             
-            if response.status_code == 200:
-                result = response.json()
-                print(f"🔍 Server response: {result}")
+            if "result" in result and result["result"]:
+                handlers = result["result"]
                 
-                if "result" in result and result["result"]:
-                    handlers = result["result"]
-                    
-                    print("\n📋 Handler Status:")
-                    for handler_name, status in handlers.items():
-                        if handler_name in ["chuk_pirate", "chuk_chef"]:
-                            sharing = status.get("session_sharing", "unknown")
-                            sandbox = status.get("shared_sandbox_group", status.get("sandbox_id", "unknown"))
-                            print(f"  {handler_name}: session_sharing={sharing}, sandbox={sandbox}")
-                else:
-                    print("⚠️  No handler status returned")
+                print("\n📋 Handler Status:")
+                for handler_name, status in handlers.items():
+                    if handler_name in ["chuk_pirate", "chuk_chef"]:
+                        sharing = status.get("session_sharing", "unknown")
+                        sandbox = status.get("shared_sandbox_group", status.get("sandbox_id", "unknown"))
+                        print(f"  {handler_name}: session_sharing={sharing}, sandbox={sandbox}")
             else:
-                print(f"❌ Server responded with status {response.status_code}")
-                print(f"Response: {response.text}")
-                
-        except Exception as e:
-            print(f"⚠️  Could not check handler status: {e}")
-            import traceback
-            traceback.print_exc()
+                print("⚠️  No handler status returned")
+        else:
+            print(f"❌ Server responded with status {response.status_code}")
+            print(f"Response: {response.text}")
+            
+    except Exception as e:
+        print(f"⚠️  Could not check handler status: {e}")
+        import traceback
+        traceback.print_exc()
 
 if __name__ == "__main__":
     print("🧪 A2A Session Sharing Test")
     print("=" * 50)
     
     async def main():
-        await test_agent_health()
-        success = await test_session_sharing()
+        async with create_client() as client:
+            await test_agent_health(client)
+            success = await test_session_sharing(client)
         
         if success:
             print("\n✅ All tests passed! Session sharing is working correctly.")
         else:
             print("\n❌ Tests failed. Check your configuration and logs.")
     
-    asyncio.run(main())
\ No newline at end of file
+    # uvloop's C event loop cuts per-await overhead when it is installed
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
\ No newline at end of file
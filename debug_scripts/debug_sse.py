@@ -10,12 +10,17 @@ to identify protocol differences.
 
 import asyncio
 import aiohttp
+import functools
 import json
 import os
 import sys
 import time
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit, parse_qs
+
+from diag_common import (CONNECTOR_OPTIONS, JSON_HEADERS, LOG_PREFIXES, PING_BODY, ServerProbes, emit,
+                         json_dumps, json_loads, log_levels_from_env)
 
 # Load environment variables from .env file
 try:
@@ -48,15 +53,82 @@ except Exception as e:
 MOCK_SERVER = "http://localhost:8020"
 REAL_SERVER = "https://application-cd.1vqsrjfxmls7.eu-gb.codeengine.appdomain.cloud"
 
-class SSEMCPDiagnostic:
+# Per-read deadline on the SSE stream: the timer resets whenever bytes arrive
+SSE_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=5, sock_read=10)
+
+# Overall deadline for reading the SSE handshake events
+SSE_HANDSHAKE_DEADLINE = 10.0
+
+# Maximum number of body bytes decoded when logging error responses
+BODY_PREVIEW_LIMIT = 512
+
+
+async def iter_sse_lines(content):
+    """Yield non-empty decoded lines from an SSE byte stream.
+
+    Chunks from ``iter_any()`` are buffered in a bytearray and split on
+    newline bytes. A newline byte never occurs inside a multibyte UTF-8
+    sequence, so each complete line decodes on its own.
+    """
+    buf = bytearray()
+    async for chunk in content.iter_any():
+        buf += chunk
+        start = 0
+        while (nl := buf.find(b'\n', start)) != -1:
+            line_str = buf[start:nl].decode('utf-8', 'replace').strip()
+            start = nl + 1
+            if line_str:
+                yield line_str
+        del buf[:start]
+    # A final line without a trailing newline
+    line_str = buf.decode('utf-8', 'replace').strip()
+    if line_str:
+        yield line_str
+
+
+# SSE field prefixes keyed on the first character of a line
+SSE_PREFIXES = {
+    'd': ('data:', 'data'),
+    'e': ('event:', 'event'),
+    ':': (':', 'comment'),
+}
+
+
+def classify_sse_line(line: str):
+    """Return ``(kind, value)`` for an SSE line, or ``(None, line)`` if unknown."""
+    entry = SSE_PREFIXES.get(line[:1])
+    if entry is None or not line.startswith(entry[0]):
+        return None, line
+    prefix, kind = entry
+    return kind, line[len(prefix):].strip()
+
+
+class SSEMCPDiagnostic(ServerProbes):
     """Diagnostic tool for SSE MCP connections."""
     
+    # Hosts that require bearer token authentication
+    _REAL_HOSTS = frozenset({urlsplit(REAL_SERVER).hostname})
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def is_real_server(url: str) -> bool:
+        """Return True if the URL points at an authenticated (real) server."""
+        return urlsplit(url).hostname in SSEMCPDiagnostic._REAL_HOSTS
+    
     def __init__(self):
         self.session = None
         self.bearer_token = os.getenv('MCP_BEARER_TOKEN')
+        self._auth_headers = {'Authorization': f'Bearer {self.bearer_token}'} if self.bearer_token else {}
+        # SSE_DIAG_LOG selects the levels shown (e.g. "WARNING" or "ERROR,SUCCESS")
+        self._levels_enabled = log_levels_from_env()
+        # Payload dumps are only serialised when DEBUG lines will be shown
+        self._debug = 'DEBUG' in self._levels_enabled
+        self._ts_second = 0
+        self._ts_str = ''
         
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        connector = aiohttp.TCPConnector(**CONNECTOR_OPTIONS)
+        self.session = aiohttp.ClientSession(connector=connector)
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -65,19 +137,30 @@ class SSEMCPDiagnostic:
     
     def log(self, level: str, message: str, **kwargs):
         """Enhanced logging with context."""
-        timestamp = time.strftime("%H:%M:%S")
-        prefix = {
-            'INFO': '🔍',
-            'SUCCESS': '✅', 
-            'WARNING': '⚠️',
-            'ERROR': '❌',
-            'DEBUG': '🐛'
-        }.get(level, '📋')
-        
-        print(f"{prefix} [{timestamp}] {message}")
+        if level not in self._levels_enabled:
+            return
+        
+        # strftime only runs when the wall-clock second changes
+        now = int(time.time())
+        if now != self._ts_second:
+            self._ts_second = now
+            self._ts_str = time.strftime("%H:%M:%S", time.localtime(now))
+        
+        lines = [f"{LOG_PREFIXES.get(level, '📋')} [{self._ts_str}] {message}\n"]
         if kwargs:
-            for key, value in kwargs.items():
-                print(f"    {key}: {value}")
+            lines.extend(f"    {key}: {value}\n" for key, value in kwargs.items())
+        emit(lines, flush=level in ('ERROR', 'WARNING'))
+    
+    def json_headers(self, is_real_server: bool, body: bytes) -> Dict[str, str]:
+        """Build POST headers for a pre-serialised JSON body."""
+        auth = self._auth_headers if is_real_server else {}
+        return {**JSON_HEADERS, **auth, 'Content-Length': str(len(body))}
+    
+    async def body_preview(self, resp, limit: int = BODY_PREVIEW_LIMIT) -> str:
+        """Read a response body as bytes and decode only a truncated preview."""
+        raw = await resp.read()
+        preview = raw[:limit].decode('utf-8', 'replace')
+        return f"{preview}…" if len(raw) > limit else preview
     
     async def test_basic_connection(self, server_url: str) -> bool:
         """Test basic HTTP connection to server."""
@@ -96,11 +179,10 @@ class SSEMCPDiagnostic:
         self.log('INFO', f"Testing SSE endpoint: {server_url}/sse")
         
         # Determine if this server needs authentication
-        is_real_server = 'application-cd.1vqsrjfxmls7.eu-gb.codeengine.appdomain.cloud' in server_url
+        is_real_server = self.is_real_server(server_url)
         
-        headers = {}
+        headers = self._auth_headers if is_real_server else {}
         if is_real_server and self.bearer_token:
-            headers['Authorization'] = f'Bearer {self.bearer_token}'
             self.log('DEBUG', "Using bearer token authentication for real server")
         elif is_real_server:
             self.log('WARNING', "Real server detected but no bearer token available")
@@ -109,13 +191,13 @@ class SSEMCPDiagnostic:
         
         try:
             sse_url = f"{server_url}/sse"
-            async with self.session.get(sse_url, headers=headers) as resp:
+            async with self.session.get(sse_url, headers=headers, timeout=SSE_TIMEOUT) as resp:
                 self.log('INFO', f"SSE endpoint response: {resp.status}")
                 
                 if resp.status != 200:
                     self.log('ERROR', f"SSE endpoint failed: {resp.status}")
-                    body = await resp.text()
-                    self.log('DEBUG', f"Response body: {body}")
+                    if self._debug:
+                        self.log('DEBUG', f"Response body: {await self.body_preview(resp)}")
                     return None
                 
                 # Read first few SSE events with timeout
@@ -124,23 +206,22 @@ class SSEMCPDiagnostic:
                 current_event = None
                 
                 try:
-                    # Set a timeout for reading events
-                    async with asyncio.timeout(10.0):  # Increased timeout
-                        async for line in resp.content:
-                            line_str = line.decode('utf-8').strip()
-                            if not line_str:
-                                continue
-                                
+                    # Keep-alive comments keep the socket busy, so sock_read
+                    # alone never fires; bound the whole handshake as well
+                    async with asyncio.timeout(SSE_HANDSHAKE_DEADLINE):
+                        async for line_str in iter_sse_lines(resp.content):
                             events.append(line_str)
                             self.log('DEBUG', f"SSE event: {line_str}")
-                            
+                        
+                            kind, value = classify_sse_line(line_str)
+
                             # Handle A2A-style SSE format
-                            if line_str.startswith('data: '):
-                                data_content = line_str[6:].strip()
-                                
+                            if kind == 'data':
+                                data_content = value
+                            
                                 # Try to parse as JSON (A2A format)
                                 try:
-                                    data = json.loads(data_content)
+                                    data = json_loads(data_content)
                                     if 'endpoint' in data:
                                         endpoint_info.update(data)
                                         self.log('SUCCESS', f"Got JSON endpoint info: {data}")
@@ -156,24 +237,24 @@ class SSEMCPDiagnostic:
                                         break
                                     else:
                                         self.log('DEBUG', f"Raw SSE data: {data_content}")
-                                        
-                            elif line_str.startswith('event: '):
-                                current_event = line_str[7:].strip()
+                                    
+                            elif kind == 'event':
+                                current_event = value
                                 self.log('DEBUG', f"SSE event type: {current_event}")
-                                
+                            
                                 # If this is an endpoint event, the next data line will have the path
                                 if current_event == 'endpoint':
                                     continue
-                                    
-                            elif line_str.startswith(': '):
+                                
+                            elif kind == 'comment':
                                 # Keep-alive comment, ignore
                                 continue
-                            
+                        
                             # Stop after reasonable number of events
                             if len(events) >= 20:
                                 self.log('WARNING', "Reached event limit, stopping")
                                 break
-                                
+                            
                 except asyncio.TimeoutError:
                     self.log('WARNING', "Timeout reading SSE events")
                 
@@ -192,7 +273,7 @@ class SSEMCPDiagnostic:
             self.log('ERROR', "No endpoint info available for MCP testing")
             return False
         
-        is_real_server = 'application-cd.1vqsrjfxmls7.eu-gb.codeengine.appdomain.cloud' in server_url
+        is_real_server = self.is_real_server(server_url)
         
         # Extract message URL from endpoint info
         message_url = None
@@ -204,11 +285,9 @@ class SSEMCPDiagnostic:
                 f"/messages/?session_id={endpoint_info['session_id']}",
                 f"/mcp?session_id={endpoint_info['session_id']}"
             ]
-            for pattern in patterns:
-                test_url = f"{server_url}{pattern}"
-                if await self.test_message_endpoint(test_url, is_real_server):
-                    message_url = test_url
-                    break
+            message_url = await self.find_message_endpoint(
+                [f"{server_url}{pattern}" for pattern in patterns], is_real_server
+            )
         
         if not message_url:
             self.log('ERROR', "Could not determine message endpoint")
@@ -216,6 +295,11 @@ class SSEMCPDiagnostic:
             
         self.log('INFO', f"Using message endpoint: {message_url}")
         
+        # Parse the session_id once; every message below reuses it
+        session_id = parse_qs(urlsplit(message_url).query).get('session_id', [None])[0]
+        if session_id:
+            self.log('DEBUG', f"Extracted session_id: {session_id}")
+        
         # Test sequence: ping -> tools/list -> tools/call
         tests = [
             ('ping', {}),
@@ -223,7 +307,7 @@ class SSEMCPDiagnostic:
         ]
         
         for method, params in tests:
-            success = await self.send_mcp_message(message_url, method, params, is_real_server)
+            success = await self.send_mcp_message(message_url, method, params, is_real_server, session_id)
             if not success and method == 'tools/list':
                 # Try alternative formats for tools/list
                 alt_formats = [
@@ -233,11 +317,7 @@ class SSEMCPDiagnostic:
                     ('tools.list', {}),
                 ]
                 
-                for alt_method, alt_params in alt_formats:
-                    self.log('INFO', f"Trying alternative format: {alt_method}")
-                    success = await self.send_mcp_message(message_url, alt_method, alt_params, is_real_server)
-                    if success:
-                        break
+                success = await self.try_alternative_formats(message_url, alt_formats, is_real_server, session_id)
             
             if not success:
                 self.log('ERROR', f"MCP method {method} failed")
@@ -245,47 +325,59 @@ class SSEMCPDiagnostic:
         
         return True
     
-    async def test_message_endpoint(self, message_url: str, is_real_server: bool = False) -> bool:
+    async def try_alternative_formats(self, message_url: str, alt_formats, is_real_server: bool = False,
+                                      session_id: Optional[str] = None) -> bool:
+        """Probe alternative method formats concurrently, stopping at the first success."""
+        async def _try(alt_method: str, alt_params: Dict[str, Any]) -> bool:
+            self.log('INFO', f"Trying alternative format: {alt_method}")
+            return await self.send_mcp_message(message_url, alt_method, alt_params, is_real_server, session_id)
+        
+        tasks = [asyncio.create_task(_try(m, p)) for m, p in alt_formats]
+        success = False
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                if await next_done:
+                    success = True
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return success
+    
+    async def find_message_endpoint(self, candidates: List[str], is_real_server: bool = False) -> Optional[str]:
+        """Ping candidate message URLs concurrently and return the first in list order that answers."""
+        tasks = [asyncio.create_task(self.test_message_endpoint(url, is_real_server)) for url in candidates]
+        try:
+            # Awaiting in candidate order keeps the preference order (/messages
+            # first) while the later probes keep running in the background
+            for url, task in zip(candidates, tasks):
+                if await task:
+                    return url
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def test_message_endpoint(self, message_url: str, is_real_server: bool = False,
+                                    body: bytes = PING_BODY) -> bool:
         """Test if a message endpoint responds to ping."""
         try:
-            headers = {'Content-Type': 'application/json'}
-            if is_real_server and self.bearer_token:
-                headers['Authorization'] = f'Bearer {self.bearer_token}'
-            
-            ping_message = {
-                "jsonrpc": "2.0",
-                "id": "test-ping",
-                "method": "ping",
-                "params": {}
-            }
+            headers = self.json_headers(is_real_server, body)
             
-            async with self.session.post(message_url, json=ping_message, headers=headers) as resp:
+            async with self.session.post(message_url, data=body, headers=headers) as resp:
                 return resp.status == 200
         except:
             return False
     
-    async def send_mcp_message(self, message_url: str, method: str, params: Dict[str, Any], is_real_server: bool = False) -> bool:
+    async def send_mcp_message(self, message_url: str, method: str, params: Dict[str, Any],
+                               is_real_server: bool = False, session_id: Optional[str] = None) -> bool:
         """Send an MCP message and analyze the response."""
         self.log('DEBUG', f"Sending MCP message: {method}")
         
-        headers = {'Content-Type': 'application/json'}
-        if is_real_server and self.bearer_token:
-            headers['Authorization'] = f'Bearer {self.bearer_token}'
-        
-        # Extract session_id from URL if present
-        session_id = None
-        if 'session_id=' in message_url:
-            session_id = message_url.split('session_id=')[1].split('&')[0]
-            self.log('DEBUG', f"Extracted session_id: {session_id}")
-        
-        # Build message with session_id if available
-        final_params = {}
-        if session_id:
-            final_params["session_id"] = session_id
-        
-        # Merge with any additional params
-        if params:
-            final_params.update(params)
+        # Build message with session_id if available, merged with any additional params
+        final_params = {"session_id": session_id, **params} if session_id else dict(params)
             
         message = {
             "jsonrpc": "2.0",
@@ -294,20 +386,25 @@ class SSEMCPDiagnostic:
             "params": final_params
         }
         
-        self.log('DEBUG', f"Request payload: {json.dumps(message, indent=2)}")
+        if self._debug:
+            self.log('DEBUG', f"Request payload: {json_dumps(message, indent=True).decode()}")
+        
+        # Serialise once with an explicit length so the body is never chunk-encoded
+        body = json_dumps(message)
+        headers = self.json_headers(is_real_server, body)
         
         try:
-            async with self.session.post(message_url, json=message, headers=headers) as resp:
+            async with self.session.post(message_url, data=body, headers=headers) as resp:
                 self.log('DEBUG', f"Response status: {resp.status}")
                 
                 if resp.status != 200:
-                    body = await resp.text()
-                    self.log('ERROR', f"HTTP error {resp.status}: {body}")
+                    self.log('ERROR', f"HTTP error {resp.status}: {await self.body_preview(resp)}")
                     return False
                 
                 try:
-                    response = await resp.json()
-                    self.log('DEBUG', f"Response: {json.dumps(response, indent=2)}")
+                    response = json_loads(await resp.read())
+                    if self._debug:
+                        self.log('DEBUG', f"Response: {json_dumps(response, indent=True).decode()}")
                     
                     if 'error' in response and response['error']:
                         error = response['error']
@@ -334,9 +431,9 @@ class SSEMCPDiagnostic:
                         return True
                         
                 except json.JSONDecodeError as e:
-                    body = await resp.text()
                     self.log('ERROR', f"Invalid JSON response: {e}")
-                    self.log('DEBUG', f"Raw response: {body}")
+                    if self._debug:
+                        self.log('DEBUG', f"Raw response: {await self.body_preview(resp)}")
                     return False
                     
         except Exception as e:
@@ -371,23 +468,27 @@ class SSEMCPDiagnostic:
             ("REAL SERVER", REAL_SERVER)
         ]
         
-        for name, url in servers:
-            self.log('INFO', f"\n🔍 Testing {name}: {url}")
-            self.log('INFO', "-" * 40)
-            
-            # Basic connection
-            if not await self.test_basic_connection(url):
-                self.log('ERROR', f"{name} basic connection failed")
-                continue
-            
-            # SSE endpoint
-            endpoint_info = await self.test_sse_endpoint(url)
-            if not endpoint_info:
-                self.log('ERROR', f"{name} SSE connection failed")
-                continue
-            
-            # MCP protocol
-            await self.test_mcp_protocol(url, endpoint_info)
+        # Servers are independent hosts, so probe them concurrently
+        await self.probe_servers(servers)
+    
+    async def _run_server(self, name: str, url: str):
+        """Run the connection, SSE and MCP checks for one server in order."""
+        self.log('INFO', f"\n🔍 Testing {name}: {url}")
+        self.log('INFO', "-" * 40)
+        
+        # Basic connection
+        if not await self.test_basic_connection(url):
+            self.log('ERROR', f"{name} basic connection failed")
+            return
+        
+        # SSE endpoint
+        endpoint_info = await self.test_sse_endpoint(url)
+        if not endpoint_info:
+            self.log('ERROR', f"{name} SSE connection failed")
+            return
+        
+        # MCP protocol
+        await self.test_mcp_protocol(url, endpoint_info)
     
     async def run_diagnostics(self):
         """Run complete diagnostic suite."""
@@ -10,6 +10,57 @@ import aiohttp
 import json
 import sys
 
+from diag_common import json_dumps, json_loads
+
+# Keep-alive tuned connector so the create + stream phases share connections
+CONNECTOR_OPTIONS = dict(limit=0, ttl_dns_cache=300, keepalive_timeout=75, enable_cleanup_closed=True)
+
+# SSE streams are long-lived: only bound the connect phase
+SSE_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_read=None, connect=10)
+
+
+# Shared read-only fallback for missing artifact payloads
+_EMPTY = {}
+
+
+class SSEEventSource:
+    """Minimal buffered SSE parser over an aiohttp response body.
+
+    Raw chunks are appended to a single ``bytearray`` and framed into events
+    without decoding; ``data`` payloads are handed back as bytes so callers can
+    pass them straight to ``json_loads``.
+    """
+
+    def __init__(self, content):
+        self._content = content
+        self._buf = bytearray()
+
+    async def events(self):
+        """Yield ``(event, data_bytes)`` for each complete SSE event."""
+        event, data = b'message', []
+        async for chunk in self._content.iter_any():
+            self._buf += chunk
+            while (nl := self._buf.find(b'\n')) != -1:
+                line = bytes(self._buf[:nl]).rstrip(b'\r')
+                del self._buf[:nl + 1]
+
+                if not line:
+                    # Blank line terminates the event
+                    if data:
+                        yield event.decode(), b'\n'.join(data)
+                    event, data = b'message', []
+                    continue
+
+                field, _, value = line.partition(b':')
+                if value[:1] == b' ':
+                    value = value[1:]
+                if field == b'data':
+                    data.append(value)
+                elif field == b'event':
+                    event = value
+                # Comments (empty field name) and unknown fields are ignored
+
+
 async def test_streaming_artifacts():
     """Test the time_ticker handler streaming behavior."""
     
@@ -31,14 +82,19 @@ async def test_streaming_artifacts():
         "id": 1
     }
     
-    async with aiohttp.ClientSession() as session:
+    connector = aiohttp.TCPConnector(**CONNECTOR_OPTIONS)
+    async with aiohttp.ClientSession(connector=connector) as session:
         # Create task
-        async with session.post(f"{base_url}/rpc", json=create_payload) as resp:
+        async with session.post(
+            f"{base_url}/rpc",
+            data=json_dumps(create_payload),
+            headers={'Content-Type': 'application/json'},
+        ) as resp:
             if resp.status != 200:
                 print(f"❌ Failed to create task: {resp.status}")
                 return
             
-            result = await resp.json()
+            result = json_loads(await resp.read())
             print(f"🔍 Raw response: {result}")
             
             # Check for actual RPC errors (not None)
@@ -65,20 +121,18 @@ async def test_streaming_artifacts():
         artifact_count = 0
         
         try:
-            async with session.get(sse_url) as resp:
+            async with session.get(sse_url, timeout=SSE_TIMEOUT) as resp:
                 if resp.status != 200:
                     print(f"❌ Failed to connect to SSE: {resp.status}")
                     return
                 
                 print("✅ Connected to SSE stream")
                 
-                async for line in resp.content:
-                    line = line.decode('utf-8').strip()
-                    
-                    if line.startswith('data: '):
+                async for event, payload in SSEEventSource(resp.content).events():
+                    if event == 'message':
                         try:
                             # Parse JSON-RPC format
-                            data = json.loads(line[6:])  # Remove 'data: ' prefix
+                            data = json_loads(payload)
                             
                             if data.get('method') == 'tasks/event':
                                 params = data.get('params', {})
@@ -87,17 +141,15 @@ async def test_streaming_artifacts():
                                 
                                 if event_type == 'artifact':
                                     artifact_count += 1
-                                    artifact = params.get('artifact', {})
+                                    artifact = params.get('artifact') or _EMPTY
                                     artifact_name = artifact.get('name', 'unknown')
                                     artifact_index = artifact.get('index', 'unknown')
                                     
-                                    # Extract text from parts
-                                    parts = artifact.get('parts', [])
-                                    text = ""
-                                    for part in parts:
-                                        if part.get('type') == 'text':
-                                            text = part.get('text', '')
-                                            break
+                                    # Extract text from the first text part
+                                    text = next(
+                                        (p.get('text', '') for p in artifact.get('parts', ()) if p.get('type') == 'text'),
+                                        '',
+                                    )
                                     
                                     print(f"📨 Artifact {artifact_count}: {artifact_name}[{artifact_index}] - {text}")
                                 
@@ -114,11 +166,7 @@ async def test_streaming_artifacts():
                             
                         except json.JSONDecodeError as e:
                             print(f"⚠️  Failed to parse SSE data: {e}")
-                            print(f"Raw line: {line}")
-                    
-                    elif line.startswith(': '):
-                        # Keep-alive comment, ignore
-                        continue
+                            print(f"Raw data: {payload.decode('utf-8', 'replace')}")
         
         except asyncio.TimeoutError:
             print("⏰ Timeout waiting for events")
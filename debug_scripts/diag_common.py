@@ -0,0 +1,109 @@
+"""
+Shared Debug Script Helpers
+===========================
+
+Optional orjson helpers, JSON-RPC request constants and the per-server log
+buffering used by the SSE diagnostics. The scripts import this module from
+their own directory, so run them as ``python debug_scripts/<script>.py``.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import sys
+from typing import Any, FrozenSet, Iterable, List, Optional, Tuple
+
+# orjson is optional (not a project dependency); fall back to the stdlib
+try:
+    import orjson
+
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+
+    json_loads = orjson.loads
+except ImportError:
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None).encode()
+
+    json_loads = json.loads
+
+# Base headers for JSON-RPC POSTs; copied, never mutated
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Pre-serialised JSON-RPC ping used to probe candidate message endpoints
+PING_BODY = json_dumps({"jsonrpc": "2.0", "id": "test-ping", "method": "ping", "params": {}})
+
+# Connection pool shared by every probe: DNS is cached and keep-alive sockets reused
+CONNECTOR_OPTIONS = dict(limit=50, limit_per_host=10, ttl_dns_cache=300, keepalive_timeout=60,
+                         enable_cleanup_closed=True)
+
+# Log level ranks for the SSE_DIAG_LOG threshold, and their prefixes
+LOG_LEVELS = {'ERROR': 0, 'WARNING': 1, 'FIX': 1, 'SUCCESS': 2, 'INFO': 3, 'DEBUG': 4}
+LOG_PREFIXES = {
+    'INFO': '🔍',
+    'SUCCESS': '✅',
+    'WARNING': '⚠️',
+    'ERROR': '❌',
+    'DEBUG': '🐛',
+    'FIX': '🔧'
+}
+
+
+def log_levels_from_env(var: str = 'SSE_DIAG_LOG') -> FrozenSet[str]:
+    """Return the log levels enabled by *var*.
+
+    A single level name or number (``WARNING``, ``2``) is a threshold; a
+    comma-separated list (``ERROR, SUCCESS``) enables exactly those levels.
+    Names are case-insensitive. Unset, or nothing recognised, enables all.
+    """
+    raw = os.getenv(var)
+    if not raw:
+        return frozenset(LOG_LEVELS)
+    tokens = [token.strip().upper() for token in raw.split(',') if token.strip()]
+    unknown = [t for t in tokens if t not in LOG_LEVELS and not (len(tokens) == 1 and t.isdigit())]
+    if unknown:
+        print(f"⚠️  Ignoring unknown {var} levels {unknown} (use {', '.join(LOG_LEVELS)} or 0-4)")
+    if len(tokens) == 1 and not unknown:
+        threshold = int(tokens[0]) if tokens[0].isdigit() else LOG_LEVELS[tokens[0]]
+        return frozenset(level for level, rank in LOG_LEVELS.items() if rank <= threshold)
+    enabled = frozenset(t for t in tokens if t in LOG_LEVELS)
+    return enabled or frozenset(LOG_LEVELS)
+
+
+# Log lines of the server pipeline running in the current task; None means print directly
+log_buffer: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar('log_buffer', default=None)
+
+
+def emit(lines: List[str], flush: bool = False) -> None:
+    """Write newline-terminated log lines to the current buffer, or to stdout."""
+    buffer = log_buffer.get()
+    if buffer is not None:
+        buffer.extend(lines)
+        return
+    sys.stdout.write(''.join(lines))
+    if flush:
+        sys.stdout.flush()
+
+
+class ServerProbes:
+    """Mixin that runs per-server check pipelines concurrently.
+
+    Subclasses provide ``log(level, message)`` and ``_run_server(name, url)``.
+    """
+
+    async def probe_server(self, name: str, url: str) -> List[str]:
+        """Run one server's checks, returning its buffered log lines."""
+        buffer: List[str] = []
+        log_buffer.set(buffer)  # gather runs each probe in its own task context
+        try:
+            await self._run_server(name, url)
+        except Exception as e:
+            self.log('ERROR', f"{name} probe failed: {e}")
+        return buffer
+
+    async def probe_servers(self, servers: Iterable[Tuple[str, str]]) -> None:
+        """Probe ``(name, url)`` pairs concurrently; the report still reads server by server."""
+        for lines in await asyncio.gather(*(self.probe_server(name, url) for name, url in servers)):
+            sys.stdout.write(''.join(lines))
+        sys.stdout.flush()
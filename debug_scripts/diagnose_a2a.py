@@ -7,7 +7,12 @@ This script diagnoses issues with A2A server handler registration and configurat
 It simulates the startup process and identifies where things go wrong.
 
 Usage:
-    python diagnose_a2a.py [config_file]
+    python diagnose_a2a.py [config_file] [--quiet] [--json]
+    
+    --quiet  Skip recording successful checks (issues and warnings only)
+    --json   Emit the report as a single JSON document
+    
+    Both flags raise the log level to WARNING.
     
     If no config file specified, looks for:
     - agent.yaml
@@ -15,17 +20,12 @@ Usage:
     - a2a_config.yaml
 """
 
-import asyncio
+import functools
 import importlib
-import inspect
-import json
 import logging
 import os
 import sys
-import traceback
-import yaml
-from pathlib import Path
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Type
 
 # Configure logging for diagnostics
 logging.basicConfig(
@@ -35,50 +35,126 @@ logging.basicConfig(
 )
 logger = logging.getLogger('a2a_diagnostic')
 
+@functools.lru_cache(maxsize=None)
+def _cached_import(dotted: str) -> Any:
+    """Resolve ``package.module.attr`` once; later passes are a dict lookup."""
+    module_path, _, name = dotted.rpartition('.')
+    module = sys.modules.get(module_path) or importlib.import_module(module_path)
+    return getattr(module, name)
+
+@functools.lru_cache(maxsize=32)
+def _cached_discover(package_name: str) -> tuple:
+    """Walk *package_name* for handler classes once per diagnostic run."""
+    from a2a_server.tasks.discovery import discover_handlers_in_package
+    return tuple(discover_handlers_in_package(package_name))
+
+# Keys in the 'handlers' section that are settings rather than handlers
+_RESERVED = frozenset({'use_discovery', 'default_handler', 'handler_packages'})
+
+def _iter_handler_configs(handlers_config: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Lazily yield ``(name, config)`` for each handler section."""
+    return ((k, v) for k, v in handlers_config.items() if k not in _RESERVED and isinstance(v, dict))
+
+# Handler config keys that are not passed to agent factories
+_AGENT_META = frozenset({'type', 'name', 'agent', 'agent_card'})
+
+# Base classes that mark a handler as agent-based
+_AGENT_BASES = frozenset({'GoogleADKHandler', 'ChukAgentHandler', 'AgentHandler'})
+
+@functools.lru_cache(maxsize=256)
+def _sig_params(cls: Type):
+    """Constructor parameters of *cls*, computed once per class."""
+    import inspect
+    return inspect.signature(cls.__init__).parameters
+
+@functools.lru_cache(maxsize=256)
+def _mro_names(cls: Type) -> tuple:
+    """Names of every class in the MRO of *cls*, computed once per class."""
+    import inspect
+    return tuple(base.__name__ for base in inspect.getmro(cls))
+
+class _Msg(NamedTuple):
+    """A single diagnostic finding."""
+    message: str
+    details: Optional[str] = None
+
 class DiagnosticResults:
     """Container for diagnostic results."""
-    def __init__(self):
+    def __init__(self, record_successes: bool = True):
+        self.record_successes = record_successes
         self.issues = []
         self.warnings = []
         self.successes = []
         self.config = None
         self.discovered_handlers = []
         self.import_errors = []
+        # Recommendation triggers, maintained as issues are recorded
+        self.has_no_handlers_issue = False
+        self.has_import_issue = False
         
     def add_issue(self, message: str, details: str = None):
-        self.issues.append({"message": message, "details": details})
+        self.issues.append(_Msg(message, details))
+        if "No handlers" in message:
+            self.has_no_handlers_issue = True
+        if "import" in message.lower():
+            self.has_import_issue = True
         
     def add_warning(self, message: str, details: str = None):
-        self.warnings.append({"message": message, "details": details})
+        self.warnings.append(_Msg(message, details))
         
     def add_success(self, message: str, details: str = None):
-        self.successes.append({"message": message, "details": details})
+        if self.record_successes:
+            self.successes.append(_Msg(message, details))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Structured view of the findings for machine consumption."""
+        return {
+            "issues": [m._asdict() for m in self.issues],
+            "warnings": [m._asdict() for m in self.warnings],
+            "successes": [m._asdict() for m in self.successes],
+            "discovered_handlers": self.discovered_handlers,
+        }
 
 class A2ADiagnostic:
     """Main diagnostic class."""
     
-    def __init__(self, config_file: Optional[str] = None):
+    def __init__(self, config_file: Optional[str] = None, quiet: bool = False):
         self.config_file = config_file
-        self.results = DiagnosticResults()
+        self.quiet = quiet
+        self.results = DiagnosticResults(record_successes=not quiet)
+        self._handlers_config: Dict[str, Any] = {}
+        self._use_discovery = False
+        self._agent_kwargs: Dict[str, Dict[str, Any]] = {}
         
     def find_config_file(self) -> Optional[str]:
         """Find the configuration file."""
-        if self.config_file and os.path.exists(self.config_file):
+        if self.config_file and os.path.isfile(self.config_file):
             return self.config_file
             
+        # One directory listing instead of a stat per candidate
+        with os.scandir('.') as entries:
+            present = {entry.name for entry in entries if entry.is_file()}
+            
         candidates = ['agent.yaml', 'config.yaml', 'a2a_config.yaml']
         for candidate in candidates:
-            if os.path.exists(candidate):
-                logger.info(f"Found config file: {candidate}")
+            if candidate in present:
+                logger.info("Found config file: %s", candidate)
                 return candidate
                 
         return None
     
     def load_config(self, config_file: str) -> Dict[str, Any]:
         """Load and validate configuration."""
+        # PyYAML is only needed once a config file has actually been found
+        import yaml
+        try:
+            from yaml import CSafeLoader as _YamlLoader  # libyaml bindings
+        except ImportError:  # pragma: no cover - PyYAML built without libyaml
+            from yaml import SafeLoader as _YamlLoader
+        
         try:
-            with open(config_file, 'r') as f:
-                config = yaml.safe_load(f)
+            with open(config_file, 'rb') as f:
+                config = yaml.load(f, Loader=_YamlLoader)
             
             self.results.add_success(f"Successfully loaded config from {config_file}")
             self.results.config = config
@@ -105,16 +181,20 @@ class A2ADiagnostic:
             self.results.add_success(f"Python version: {sys.version}")
         
         # Check critical imports
-        critical_modules = [
+        critical_modules = (
             'a2a_server',
             'a2a_server.app',
             'a2a_server.tasks.task_manager',
             'a2a_server.tasks.discovery',
             'a2a_server.tasks.handlers.task_handler',
             'a2a_server.tasks.handlers.echo_handler',
-        ]
+        )
         
         for module_name in critical_modules:
+            # Already-imported modules skip the import machinery entirely
+            if module_name in sys.modules:
+                self.results.add_success(f"✅ {module_name}")
+                continue
             try:
                 importlib.import_module(module_name)
                 self.results.add_success(f"✅ {module_name}")
@@ -126,7 +206,7 @@ class A2ADiagnostic:
         """Analyze the handlers configuration section."""
         logger.info("🔍 Analyzing handlers configuration...")
         
-        handlers_config = config.get('handlers', {})
+        handlers_config = self._handlers_config
         if not handlers_config:
             self.results.add_issue("No 'handlers' section found in configuration")
             return
@@ -134,7 +214,7 @@ class A2ADiagnostic:
         self.results.add_success("Found 'handlers' section in configuration")
         
         # Check use_discovery setting
-        use_discovery = handlers_config.get('use_discovery', False)
+        use_discovery = self._use_discovery
         self.results.add_success(f"use_discovery: {use_discovery}")
         
         # Check default_handler setting
@@ -152,23 +232,20 @@ class A2ADiagnostic:
             else:
                 self.results.add_warning("use_discovery=true but no handler_packages specified")
         
-        # Analyze individual handler configurations
-        handler_configs = {
-            k: v for k, v in handlers_config.items() 
-            if k not in ['use_discovery', 'default_handler', 'handler_packages'] and isinstance(v, dict)
-        }
+        # Analyze individual handler configurations in a single pass
+        names = []
+        for name, handler_config in _iter_handler_configs(handlers_config):
+            names.append(name)
+            self.analyze_handler_config(name, handler_config)
         
-        if handler_configs:
-            self.results.add_success(f"Found {len(handler_configs)} handler configurations: {list(handler_configs.keys())}")
-            for name, config in handler_configs.items():
-                self.analyze_handler_config(name, config)
-        else:
-            if not use_discovery:
-                self.results.add_issue("No handler configurations found and use_discovery=false")
+        if names:
+            self.results.add_success(f"Found {len(names)} handler configurations: {names}")
+        elif not use_discovery:
+            self.results.add_issue("No handler configurations found and use_discovery=false")
     
     def analyze_handler_config(self, name: str, config: Dict[str, Any]):
         """Analyze a specific handler configuration."""
-        logger.info(f"🔍 Analyzing handler: {name}")
+        logger.info("🔍 Analyzing handler: %s", name)
         
         # Check required fields
         handler_type = config.get('type')
@@ -178,11 +255,13 @@ class A2ADiagnostic:
             
         self.results.add_success(f"Handler '{name}' type: {handler_type}")
         
+        # Agent factory kwargs are shared by the later passes
+        self.agent_kwargs(name, config)
+        
         # Try to import the handler class
         try:
             module_path, _, class_name = handler_type.rpartition('.')
-            module = importlib.import_module(module_path)
-            handler_class = getattr(module, class_name)
+            handler_class = _cached_import(handler_type)
             self.results.add_success(f"✅ Handler class {class_name} imported successfully")
             
             # Check if it's agent-based
@@ -200,12 +279,20 @@ class A2ADiagnostic:
         except Exception as e:
             self.results.add_issue(f"Error analyzing handler '{name}'", str(e))
     
+    def agent_kwargs(self, name: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Return (and cache) the agent factory kwargs for a handler config."""
+        kwargs = self._agent_kwargs.get(name)
+        if kwargs is None:
+            kwargs = self._agent_kwargs[name] = {k: v for k, v in config.items() if k not in _AGENT_META}
+        return kwargs
+    
     def check_if_agent_based_handler(self, handler_class: Type) -> bool:
         """Check if a handler class is agent-based."""
+        import inspect
+        
         try:
             # Check constructor signature for 'agent' parameter
-            sig = inspect.signature(handler_class.__init__)
-            params = sig.parameters
+            params = _sig_params(handler_class)
             
             if 'agent' in params:
                 agent_param = params['agent']
@@ -213,18 +300,15 @@ class A2ADiagnostic:
                     return True
                     
             # Check class hierarchy for known agent-based classes
-            for base_class in inspect.getmro(handler_class):
-                class_name = base_class.__name__
-                if class_name in ['GoogleADKHandler', 'ChukAgentHandler', 'AgentHandler']:
-                    return True
-                    
-            return False
+            return not _AGENT_BASES.isdisjoint(_mro_names(handler_class))
             
         except Exception:
             return False
     
     def check_agent_config(self, handler_name: str, config: Dict[str, Any]):
         """Check agent configuration for agent-based handlers."""
+        import inspect
+        
         agent_spec = config.get('agent')
         if not agent_spec:
             self.results.add_issue(f"Agent-based handler '{handler_name}' missing 'agent' configuration")
@@ -234,15 +318,13 @@ class A2ADiagnostic:
             # Check if agent factory function exists
             try:
                 module_path, _, func_name = agent_spec.rpartition('.')
-                module = importlib.import_module(module_path)
-                agent_factory = getattr(module, func_name)
+                agent_factory = _cached_import(agent_spec)
                 
                 if callable(agent_factory):
                     self.results.add_success(f"✅ Agent factory '{func_name}' found and callable")
                     
                     # Check if we can call it with the provided config
-                    agent_config = {k: v for k, v in config.items() 
-                                   if k not in ['type', 'name', 'agent', 'agent_card']}
+                    agent_config = self.agent_kwargs(handler_name, config)
                     
                     try:
                         # Get function signature
@@ -278,20 +360,13 @@ class A2ADiagnostic:
         """Test the handler discovery process."""
         logger.info("🔍 Testing handler discovery process...")
         
-        handlers_config = config.get('handlers', {})
-        use_discovery = handlers_config.get('use_discovery', False)
+        handlers_config = self._handlers_config
         
-        if use_discovery:
+        if self._use_discovery:
             self.test_package_discovery(handlers_config.get('handler_packages', []))
         
         # Test explicit handler registration
-        handler_configs = {
-            k: v for k, v in handlers_config.items() 
-            if k not in ['use_discovery', 'default_handler', 'handler_packages'] and isinstance(v, dict)
-        }
-        
-        if handler_configs:
-            self.test_explicit_handler_registration(handler_configs)
+        self.test_explicit_handler_registration(_iter_handler_configs(handlers_config))
     
     def test_package_discovery(self, packages: List[str]):
         """Test package-based handler discovery."""
@@ -302,15 +377,12 @@ class A2ADiagnostic:
             
         for package_name in packages:
             try:
-                # Try to import the discovery module
-                from a2a_server.tasks.discovery import discover_handlers_in_package
-                
-                handlers = list(discover_handlers_in_package(package_name))
+                handlers = _cached_discover(package_name)
                 if handlers:
                     self.results.add_success(f"Discovered {len(handlers)} handlers in {package_name}")
                     for handler_class in handlers:
                         self.results.discovered_handlers.append(handler_class.__name__)
-                        logger.info(f"  - {handler_class.__name__}")
+                        logger.info("  - %s", handler_class.__name__)
                 else:
                     self.results.add_warning(f"No handlers discovered in package {package_name}")
                     
@@ -319,24 +391,21 @@ class A2ADiagnostic:
             except Exception as e:
                 self.results.add_issue(f"Error during package discovery for {package_name}", str(e))
     
-    def test_explicit_handler_registration(self, handler_configs: Dict[str, Any]):
+    def test_explicit_handler_registration(self, handler_configs: Iterable[Tuple[str, Dict[str, Any]]]):
         """Test explicit handler registration."""
         logger.info("🔍 Testing explicit handler registration...")
         
-        for name, config in handler_configs.items():
+        for name, config in handler_configs:
             try:
                 # Try to create the handler
                 handler_type = config.get('type')
                 if not handler_type:
                     continue
                     
-                module_path, _, class_name = handler_type.rpartition('.')
-                module = importlib.import_module(module_path)
-                handler_class = getattr(module, class_name)
+                handler_class = _cached_import(handler_type)
                 
                 # Check if we can create it
-                sig = inspect.signature(handler_class.__init__)
-                valid_params = set(sig.parameters.keys()) - {"self"}
+                valid_params = set(_sig_params(handler_class)) - {"self"}
                 
                 test_kwargs = {k: v for k, v in config.items() if k in valid_params}
                 test_kwargs['name'] = name
@@ -346,14 +415,11 @@ class A2ADiagnostic:
                     agent_spec = config['agent']
                     if isinstance(agent_spec, str):
                         try:
-                            agent_module_path, _, agent_func_name = agent_spec.rpartition('.')
-                            agent_module = importlib.import_module(agent_module_path)
-                            agent_factory = getattr(agent_module, agent_func_name)
+                            agent_factory = _cached_import(agent_spec)
                             
                             if callable(agent_factory):
                                 # Try to create agent with config
-                                agent_config = {k: v for k, v in config.items() 
-                                               if k not in ['type', 'name', 'agent', 'agent_card']}
+                                agent_config = self.agent_kwargs(name, config)
                                 test_kwargs['agent'] = agent_factory(**agent_config)
                                 self.results.add_success(f"✅ Agent created for handler '{name}'")
                             else:
@@ -369,7 +435,7 @@ class A2ADiagnostic:
                 
             except Exception as e:
                 self.results.add_issue(f"Failed to create handler '{name}'", str(e))
-                logger.exception(f"Error creating handler '{name}':")
+                logger.exception("Error creating handler '%s':", name)
     
     def simulate_startup(self, config: Dict[str, Any]):
         """Simulate the A2A server startup process."""
@@ -387,10 +453,19 @@ class A2ADiagnostic:
             self.results.add_success("✅ TaskManager and EventBus created")
             
             # Simulate handler registration
-            handlers_config = config.get('handlers', {})
-            use_discovery = handlers_config.get('use_discovery', False)
+            handlers_config = self._handlers_config
             
-            if use_discovery:
+            # Handlers receive the same session store app.py injects
+            from a2a_server.session_store_factory import build_session_manager
+            
+            sess_cfg = handlers_config.get('_session_store', {})
+            session_store = build_session_manager(
+                sandbox_id=sess_cfg.get('sandbox_id', 'a2a-server'),
+                default_ttl_hours=sess_cfg.get('default_ttl_hours', 24)
+            )
+            extra_kwargs = {'session_store': session_store}
+            
+            if self._use_discovery:
                 # Try discovery
                 from a2a_server.tasks.discovery import register_discovered_handlers
                 
@@ -399,8 +474,9 @@ class A2ADiagnostic:
                 register_discovered_handlers(
                     task_manager,
                     packages=handler_packages,
-                    **{k: v for k, v in handlers_config.items() 
-                       if k not in ['use_discovery', 'default_handler', 'handler_packages'] and isinstance(v, dict)}
+                    default_handler_class=None,
+                    extra_kwargs=extra_kwargs,
+                    **dict(_iter_handler_configs(handlers_config))
                 )
                 
                 # Check what was registered
@@ -414,14 +490,16 @@ class A2ADiagnostic:
                     else:
                         self.results.add_warning("No default handler set after discovery")
                 else:
-                    self.results.add_issue("Discovery failed to register any handlers")
+                    # Reuse the package walk from test_package_discovery for context
+                    discoverable = sum(len(_cached_discover(pkg)) for pkg in handler_packages)
+                    self.results.add_issue(
+                        "Discovery failed to register any handlers",
+                        f"{discoverable} handler classes discoverable in {handler_packages}"
+                    )
                     
             else:
                 # Explicit handler registration
-                handler_configs = {
-                    k: v for k, v in handlers_config.items() 
-                    if k not in ['use_discovery', 'default_handler', 'handler_packages'] and isinstance(v, dict)
-                }
+                handler_configs = dict(_iter_handler_configs(handlers_config))
                 
                 if handler_configs:
                     from a2a_server.tasks.discovery import register_discovered_handlers
@@ -429,6 +507,8 @@ class A2ADiagnostic:
                     register_discovered_handlers(
                         task_manager,
                         packages=None,
+                        default_handler_class=None,
+                        extra_kwargs=extra_kwargs,
                         **handler_configs
                     )
                     
@@ -478,6 +558,10 @@ class A2ADiagnostic:
         if not config:
             return self.results
         
+        # Bind the handlers section once for every pass below
+        self._handlers_config = config.get('handlers') or {}
+        self._use_discovery = bool(self._handlers_config.get('use_discovery'))
+        
         # Run diagnostics
         self.check_python_environment()
         
@@ -488,70 +572,95 @@ class A2ADiagnostic:
         
         return self.results
     
+    def print_json_report(self):
+        """Print the diagnostic results as a single JSON document."""
+        import json
+        sys.stdout.write(json.dumps(self.results.to_dict(), default=str) + '\n')
+        sys.stdout.flush()
+    
     def print_report(self):
-        """Print a comprehensive diagnostic report."""
+        """Print a comprehensive diagnostic report in a single buffered write."""
         results = self.results
+        out = []
         
-        print("\n" + "="*80)
-        print("🏥 A2A SERVER DIAGNOSTIC REPORT")
-        print("="*80)
+        out.append("\n" + "="*80)
+        out.append("🏥 A2A SERVER DIAGNOSTIC REPORT")
+        out.append("="*80)
         
         if results.issues:
-            print(f"\n❌ CRITICAL ISSUES ({len(results.issues)}):")
+            out.append(f"\n❌ CRITICAL ISSUES ({len(results.issues)}):")
             for i, issue in enumerate(results.issues, 1):
-                print(f"  {i}. {issue['message']}")
-                if issue['details']:
-                    print(f"     Details: {issue['details']}")
+                out.append(f"  {i}. {issue.message}")
+                if issue.details:
+                    out.append(f"     Details: {issue.details}")
         
         if results.warnings:
-            print(f"\n⚠️  WARNINGS ({len(results.warnings)}):")
+            out.append(f"\n⚠️  WARNINGS ({len(results.warnings)}):")
             for i, warning in enumerate(results.warnings, 1):
-                print(f"  {i}. {warning['message']}")
-                if warning['details']:
-                    print(f"     Details: {warning['details']}")
+                out.append(f"  {i}. {warning.message}")
+                if warning.details:
+                    out.append(f"     Details: {warning.details}")
         
         if results.successes:
-            print(f"\n✅ SUCCESSFUL CHECKS ({len(results.successes)}):")
+            out.append(f"\n✅ SUCCESSFUL CHECKS ({len(results.successes)}):")
             for i, success in enumerate(results.successes, 1):
-                print(f"  {i}. {success['message']}")
+                out.append(f"  {i}. {success.message}")
         
         if results.discovered_handlers:
-            print(f"\n🔍 DISCOVERED HANDLERS:")
+            out.append(f"\n🔍 DISCOVERED HANDLERS:")
             for handler in results.discovered_handlers:
-                print(f"  - {handler}")
+                out.append(f"  - {handler}")
         
         # Summary and recommendations
-        print(f"\n📊 SUMMARY:")
-        print(f"  Issues: {len(results.issues)}")
-        print(f"  Warnings: {len(results.warnings)}")
-        print(f"  Successes: {len(results.successes)}")
+        out.append(f"\n📊 SUMMARY:")
+        out.append(f"  Issues: {len(results.issues)}")
+        out.append(f"  Warnings: {len(results.warnings)}")
+        out.append(f"  Successes: {len(results.successes)}")
         
         if results.issues:
-            print(f"\n🔧 RECOMMENDATIONS:")
-            if any("No handlers" in issue['message'] for issue in results.issues):
-                print("  1. Check your handler configuration in the YAML file")
-                print("  2. Ensure handler classes can be imported")
-                print("  3. Consider enabling use_discovery: true")
+            out.append(f"\n🔧 RECOMMENDATIONS:")
+            if results.has_no_handlers_issue:
+                out.append("  1. Check your handler configuration in the YAML file")
+                out.append("  2. Ensure handler classes can be imported")
+                out.append("  3. Consider enabling use_discovery: true")
             
-            if any("import" in issue['message'].lower() for issue in results.issues):
-                print("  4. Check your Python environment and package installations")
-                print("  5. Verify all required dependencies are installed")
+            if results.has_import_issue:
+                out.append("  4. Check your Python environment and package installations")
+                out.append("  5. Verify all required dependencies are installed")
+        
+        out.append("\n" + "="*80)
         
-        print("\n" + "="*80)
+        sys.stdout.write('\n'.join(out) + '\n')
+        sys.stdout.flush()
 
 def main():
     """Main diagnostic function."""
-    config_file = sys.argv[1] if len(sys.argv) > 1 else None
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="A2A Server Diagnostic")
+    parser.add_argument("config_file", nargs="?", help="Configuration file to diagnose")
+    parser.add_argument("--quiet", action="store_true", help="Only record issues and warnings")
+    parser.add_argument("--json", action="store_true", help="Emit the report as JSON")
+    args = parser.parse_args()
     
-    diagnostic = A2ADiagnostic(config_file)
+    # Quiet and JSON runs only need warnings, so skip building the debug and
+    # info records the handlers emit while they are imported and constructed
+    if args.quiet or args.json:
+        logging.getLogger().setLevel(logging.WARNING)
+    
+    diagnostic = A2ADiagnostic(args.config_file, quiet=args.quiet)
     diagnostic.run_diagnostics()
-    diagnostic.print_report()
+    if args.json:
+        diagnostic.print_json_report()
+    else:
+        diagnostic.print_report()
     
     # Exit with error code if there are critical issues
     if diagnostic.results.issues:
         sys.exit(1)
     else:
-        print("\n🎉 No critical issues found!")
+        if not args.json:
+            print("\n🎉 No critical issues found!")
         sys.exit(0)
 
 if __name__ == "__main__":
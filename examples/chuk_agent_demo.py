@@ -6,10 +6,24 @@ Standalone ChukAgent Test Script - CLEANED VERSION
 Test ChukAgent directly without A2A framework to isolate issues.
 """
 import asyncio
+import atexit
+import functools
+import hashlib
+import importlib
+import io
 import json
 import logging
+import logging.config
 import os
+import re
+import sqlite3
+import sys
+import tempfile
 from pathlib import Path
+from typing import TYPE_CHECKING, Type
+
+if TYPE_CHECKING:
+    from a2a_server.tasks.handlers.chuk.chuk_agent import ChukAgent
 
 # Load environment variables from .env file
 try:
@@ -21,52 +35,183 @@ except ImportError:
 except Exception as e:
     print(f"ℹ Could not load .env: {e}")
 
-def setup_clean_logging():
-    """Setup cleaner logging levels for testing."""
-    # Keep main agent logs at INFO
-    logging.getLogger('a2a_server.tasks.handlers.chuk.chuk_agent').setLevel(logging.INFO)
-    
-    # Move noisy tool processor logs to WARNING/DEBUG
-    logging.getLogger('chuk_tool_processor').setLevel(logging.WARNING)
-    logging.getLogger('chuk_tool_processor.span').setLevel(logging.WARNING)
-    logging.getLogger('chuk_tool_processor.span.inprocess_execution').setLevel(logging.WARNING)
-    logging.getLogger('chuk_tool_processor.mcp.stream_manager').setLevel(logging.WARNING)
-    logging.getLogger('chuk_tool_processor.mcp.register').setLevel(logging.WARNING)
-    logging.getLogger('chuk_tool_processor.mcp.setup_stdio').setLevel(logging.WARNING)
-    logging.getLogger('chuk_tool_processor.mcp.transport.stdio_transport').setLevel(logging.WARNING)
-    
-    # Keep session manager logs quieter
-    logging.getLogger('chuk_sessions').setLevel(logging.WARNING)
-    logging.getLogger('chuk_ai_session_manager').setLevel(logging.WARNING)
-    
-    # Keep LLM provider logs quiet
-    logging.getLogger('chuk_llm').setLevel(logging.WARNING)
-    
-    # Keep root MCP logs quiet
-    logging.getLogger('root').setLevel(logging.WARNING)
-    
-    # Also suppress any sample agent creation logs
-    logging.getLogger('a2a_server.sample_agents').setLevel(logging.WARNING)
-    logging.getLogger('a2a_server.sample_agents.perplexity_agent').setLevel(logging.WARNING)
-    
-    # Suppress noisy SSE transport logs
-    logging.getLogger('chuk_tool_processor.mcp.transport.sse_transport').setLevel(logging.ERROR)
-    logging.getLogger('chuk_tool_processor.mcp.setup_sse').setLevel(logging.WARNING)
+# Per-logger levels: agent logs at INFO, noisy tool/session/provider logs quieter
+_LOGGER_LEVELS = {
+    'a2a_server.tasks.handlers.chuk.chuk_agent': 'INFO',
+    'httpx': 'WARNING',
+    'openai': 'WARNING',
+    'chuk_tool_processor': 'WARNING',
+    'chuk_tool_processor.span': 'WARNING',
+    'chuk_tool_processor.span.inprocess_execution': 'WARNING',
+    'chuk_tool_processor.mcp.stream_manager': 'WARNING',
+    'chuk_tool_processor.mcp.register': 'WARNING',
+    'chuk_tool_processor.mcp.setup_stdio': 'WARNING',
+    'chuk_tool_processor.mcp.transport.stdio_transport': 'WARNING',
+    'chuk_tool_processor.mcp.transport.sse_transport': 'ERROR',
+    'chuk_tool_processor.mcp.setup_sse': 'WARNING',
+    'chuk_sessions': 'WARNING',
+    'chuk_ai_session_manager': 'WARNING',
+    'chuk_llm': 'WARNING',
+    'a2a_server.sample_agents': 'WARNING',
+    'a2a_server.sample_agents.perplexity_agent': 'WARNING',
+}
 
-# Set up logging to see what's happening
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# ✅ Apply clean logging configuration in one pass; root stays at WARNING to
+# keep root-level MCP logs quiet
+logging.config.dictConfig({
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "std": {"format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"}
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "std"}
+    },
+    "loggers": {name: {"level": level} for name, level in _LOGGER_LEVELS.items()},
+    "root": {"handlers": ["console"], "level": "WARNING"},
+})
 
-# Quiet some noisy loggers
-logging.getLogger('httpx').setLevel(logging.WARNING)
-logging.getLogger('openai').setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
 
-# ✅ Apply clean logging configuration
-setup_clean_logging()
+# Module holding each sample agent, by agent name
+_SAMPLE_AGENT_MODULES = {
+    "time_agent": "time_agent",
+    "chef_agent": "chuk_chef",
+    "weather_agent": "weather_agent",
+    "perplexity_agent": "perplexity_agent",
+}
 
-logger = logging.getLogger(__name__)
+@functools.lru_cache(maxsize=None)
+def _get_chuk_agent_cls() -> Type["ChukAgent"]:
+    """Import ChukAgent (and its LLM/MCP stack) once, on first use."""
+    from a2a_server.tasks.handlers.chuk.chuk_agent import ChukAgent
+    return ChukAgent
+
+@functools.lru_cache(maxsize=None)
+def _get_sample_agent(name: str):
+    """Import a sample agent's module once and return the agent instance."""
+    module = importlib.import_module(f"a2a_server.sample_agents.{_SAMPLE_AGENT_MODULES[name]}")
+    return getattr(module, name)
+
+# Optional on-disk cache of LLM answers (A2A_DEMO_CACHE=1) so repeat runs skip
+# the round trip. Off by default: a cached answer does not exercise the agent.
+_CACHE_ENABLED = os.getenv("A2A_DEMO_CACHE", "0") == "1"
+_CACHE_PATH = Path(".llm_demo_cache.sqlite")
+
+class _LLMCache:
+    """Tiny sqlite key/value store for demo LLM responses."""
+    
+    def __init__(self, path: Path):
+        self._db = sqlite3.connect(path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT)")
+    
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    
+    def get(self, key: str):
+        row = self._db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+    
+    def set(self, key: str, value) -> None:
+        try:
+            payload = json.dumps(value)
+        except TypeError:
+            return  # not JSON-serialisable; just don't cache it
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?)", (key, payload))
+    
+    def close(self) -> None:
+        self._db.close()
+
+_llm_cache = _LLMCache(_CACHE_PATH) if _CACHE_ENABLED else None
+if _llm_cache is not None:
+    atexit.register(_llm_cache.close)
+
+# Caps concurrent LLM requests now that tests and agents fan out together
+_LLM_SEM = asyncio.Semaphore(int(os.getenv("A2A_DEMO_CONCURRENCY", "5")))
+
+async def _guarded(coro):
+    """Await an LLM call while holding a concurrency slot."""
+    async with _LLM_SEM:
+        return await coro
+
+async def cached_chat(agent, prompt: str, **kwargs) -> str:
+    """agent.chat(), answered from the demo cache when enabled."""
+    if _llm_cache is None:
+        return await _guarded(agent.chat(prompt, **kwargs))
+    key = _llm_cache.key("chat", agent.name, getattr(agent, "model", None), prompt)
+    cached = _llm_cache.get(key)
+    if cached is not None:
+        return cached
+    response = await _guarded(agent.chat(prompt, **kwargs))
+    _llm_cache.set(key, response)
+    return response
+
+async def cached_completion(agent, llm_client, messages):
+    """llm_client.create_completion(), answered from the demo cache when enabled."""
+    if _llm_cache is None:
+        return await _guarded(llm_client.create_completion(messages=messages))
+    key = _llm_cache.key("completion", agent.provider, agent.model, messages)
+    cached = _llm_cache.get(key)
+    if cached is not None:
+        return cached
+    response = await _guarded(llm_client.create_completion(messages=messages))
+    _llm_cache.set(key, response)
+    return response
+
+def _snip(text: str, n: int = 100) -> str:
+    """Truncate text for display, marking the cut with an ellipsis."""
+    return text if len(text) <= n else text[:n] + "..."
+
+def _write_temp_json(data: dict, prefix: str) -> str:
+    """Write *data* to a new uniquely named JSON file and return its path."""
+    fd, path = tempfile.mkstemp(suffix='.json', prefix=prefix)
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, indent=2)
+    return path
+
+async def _run_buffered(test_func):
+    """Run a test with its output buffered, then write it in one piece.
+    
+    Tests run concurrently, so this keeps each test's output contiguous.
+    """
+    buf = io.StringIO()
+    try:
+        return await test_func(functools.partial(print, file=buf))
+    finally:
+        sys.stdout.write(buf.getvalue())
+
+def _indicator_pattern(indicators):
+    """Compile substring indicators into one alternation scanned in a single pass."""
+    return re.compile("|".join(map(re.escape, indicators)))
+
+# Response indicators per agent, compiled once at import
+# time_agent: real-time responses (MCP tools working) and helpful fallbacks
+_TIME_REAL = _indicator_pattern([
+    "current time", "time in new york", "11:", "12:", "2025",
+    "am", "pm", "america/new_york"
+])
+_TIME_FALLBACK = _indicator_pattern([
+    "timeanddate.com", "system clock", "timezone",
+    "help with", "check", "recommend"
+])
+# chef_agent should provide recipe content
+_RECIPE = _indicator_pattern([
+    "scrambled eggs", "recipe", "ingredients", "cooking",
+    "breakfast", "##", "###", "instructions", "steps"
+])
+# weather_agent should provide helpful guidance
+_WEATHER = _indicator_pattern([
+    "weather.com", "accuweather", "recommend", "reliable sources",
+    "weather app", "feel free to ask", "check", "unable to access"
+])
+# perplexity_agent should provide research-like responses or helpful fallback
+_RESEARCH = _indicator_pattern([
+    "research", "according to", "based on", "studies show", "data indicates",
+    "search", "find", "information", "sources", "analysis", "artificial intelligence",
+    "ai", "machine learning", "weather", "current", "real-time"
+])
 
 def evaluate_agent_response(agent_name: str, response: str) -> dict:
     """
@@ -85,92 +230,60 @@ def evaluate_agent_response(agent_name: str, response: str) -> dict:
         "response_length": len(response) if response else 0
     }
     
-    if not response or len(response.strip()) < 10:
+    stripped_length = len(response.strip()) if response else 0
+    if stripped_length < 10:
         evaluation["reason"] = "Empty or too short response"
         return evaluation
         
     response_lower = response.lower()
     
     if agent_name == "time_agent":
-        # Check for real-time responses (MCP tools working)
-        real_time_indicators = [
-            "current time", "time in new york", "11:", "12:", "2025", 
-            "am", "pm", "america/new_york"
-        ]
-        
-        # Check for helpful fallback responses
-        fallback_indicators = [
-            "timeanddate.com", "system clock", "timezone", 
-            "help with", "check", "recommend"
-        ]
-        
-        if any(indicator in response_lower for indicator in real_time_indicators):
+        if _TIME_REAL.search(response_lower):
             evaluation["success"] = True
             evaluation["reason"] = "Provided real-time information (MCP tools working)"
-        elif any(indicator in response_lower for indicator in fallback_indicators):
+        elif _TIME_FALLBACK.search(response_lower):
             evaluation["success"] = True
             evaluation["reason"] = "Provided helpful fallback guidance"
         else:
             evaluation["reason"] = "Poor time-related response"
     
     elif agent_name == "chef_agent":
-        # Chef should provide recipe content
-        recipe_indicators = [
-            "scrambled eggs", "recipe", "ingredients", "cooking", 
-            "breakfast", "##", "###", "instructions", "steps"
-        ]
-        
-        if any(indicator in response_lower for indicator in recipe_indicators):
+        if _RECIPE.search(response_lower):
             evaluation["success"] = True
             evaluation["reason"] = "Provided recipe content"
         else:
             evaluation["reason"] = "No recipe content found"
     
     elif agent_name == "weather_agent":
-        # Weather should provide helpful guidance
-        weather_indicators = [
-            "weather.com", "accuweather", "recommend", "reliable sources",
-            "weather app", "feel free to ask", "check", "unable to access"
-        ]
-        
-        if any(indicator in response_lower for indicator in weather_indicators):
+        if _WEATHER.search(response_lower):
             evaluation["success"] = True
             evaluation["reason"] = "Provided helpful weather guidance"
         else:
             evaluation["reason"] = "Poor weather response"
     
     elif agent_name == "perplexity_agent":
-        # Perplexity should provide research-like responses or helpful fallback
-        research_indicators = [
-            "research", "according to", "based on", "studies show", "data indicates",
-            "search", "find", "information", "sources", "analysis", "artificial intelligence",
-            "ai", "machine learning", "weather", "current", "real-time"
-        ]
-        
-        if any(indicator in response_lower for indicator in research_indicators):
+        if _RESEARCH.search(response_lower):
             evaluation["success"] = True
             evaluation["reason"] = "Provided research-style response"
         else:
             evaluation["reason"] = "Poor research response"
     
     # Additional check: any substantial response is generally good
-    if not evaluation["success"] and len(response.strip()) > 100:
+    if not evaluation["success"] and stripped_length > 100:
         evaluation["success"] = True
         evaluation["reason"] = "Substantial helpful response"
     
     return evaluation
 
-async def test_basic_chuk_agent():
+async def test_basic_chuk_agent(p=print):
     """Test a basic ChukAgent without MCP tools."""
-    print("\n" + "="*60)
-    print("Testing Basic ChukAgent (No MCP Tools)")
-    print("="*60)
+    p("\n" + "="*60)
+    p("Testing Basic ChukAgent (No MCP Tools)")
+    p("="*60)
     
     try:
-        from a2a_server.tasks.handlers.chuk.chuk_agent import ChukAgent
-        
         # Create a simple agent without MCP tools
-        agent = ChukAgent(
+        agent = _get_chuk_agent_cls()(
             name="test_agent",
             provider="openai",
             model="gpt-4o-mini",
@@ -178,67 +291,66 @@ async def test_basic_chuk_agent():
             instruction="You are a helpful AI assistant. Always respond clearly and concisely.",
             enable_sessions=False,  # Disable sessions for simplicity
             enable_tools=False,     # Explicitly disable tools
-            debug_tools=False       # Disable debug output
+            debug_tools=False,      # Disable debug output
+            reuse_llm_client=True   # Share one client (and its connection pool) across calls
         )
         
-        print(f"✓ Agent created: {agent.name}")
-        print(f"✓ Provider: {agent.provider}")
-        print(f"✓ Model: {agent.model}")
+        p(f"✓ Agent created: {agent.name}")
+        p(f"✓ Provider: {agent.provider}")
+        p(f"✓ Model: {agent.model}")
         
         # Test environment
         api_key = os.getenv('OPENAI_API_KEY')
-        print(f"✓ OpenAI API Key: {'SET' if api_key else 'NOT SET'}")
+        p(f"✓ OpenAI API Key: {'SET' if api_key else 'NOT SET'}")
         if not api_key:
-            print("❌ Error: OPENAI_API_KEY environment variable not set!")
+            p("❌ Error: OPENAI_API_KEY environment variable not set!")
             return False
         
         # Test system prompt
         system_prompt = agent.get_system_prompt()
-        print(f"✓ System prompt: {system_prompt[:100]}...")
+        p(f"✓ System prompt: {system_prompt[:100]}...")
         
         # Test LLM client creation
-        print("\n--- Testing LLM Client ---")
+        p("\n--- Testing LLM Client ---")
         llm_client = await agent.get_llm_client()
-        print(f"✓ LLM client created: {type(llm_client).__name__}")
+        p(f"✓ LLM client created: {type(llm_client).__name__}")
         
         # Test direct LLM call
-        print("\n--- Testing Direct LLM Call ---")
+        p("\n--- Testing Direct LLM Call ---")
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": "Say 'Hello World' and tell me what 2+2 equals."}
         ]
         
-        response = await llm_client.create_completion(messages=messages)
+        response = await cached_completion(agent, llm_client, messages)
         extracted = agent._extract_response_content(response)
-        print(f"✓ LLM response: '{extracted}'")
+        p(f"✓ LLM response: '{extracted}'")
         
         # Test complete method
-        print("\n--- Testing Complete Method ---")
-        result = await agent.complete(messages, use_tools=False)
-        print(f"✓ Complete content: '{result.get('content', 'NO CONTENT')}'")
+        p("\n--- Testing Complete Method ---")
+        result = await _guarded(agent.complete(messages, use_tools=False))
+        p(f"✓ Complete content: '{result.get('content', 'NO CONTENT')}'")
         
         # Test chat method
-        print("\n--- Testing Chat Method ---")
-        chat_response = await agent.chat("What is the capital of France?")
-        print(f"✓ Chat response: '{chat_response}'")
+        p("\n--- Testing Chat Method ---")
+        chat_response = await cached_chat(agent, "What is the capital of France?")
+        p(f"✓ Chat response: '{chat_response}'")
         
         return True
         
     except Exception as e:
-        print(f"❌ Error in basic test: {e}")
+        p(f"❌ Error in basic test: {e}")
         return False
 
-async def test_chuk_agent_with_mcp():
+async def test_chuk_agent_with_mcp(p=print):
     """Test ChukAgent with MCP tools."""
-    print("\n" + "="*60)
-    print("Testing ChukAgent with MCP Tools")
-    print("="*60)
+    p("\n" + "="*60)
+    p("Testing ChukAgent with MCP Tools")
+    p("="*60)
     
+    config_file = None
     try:
-        from a2a_server.tasks.handlers.chuk.chuk_agent import ChukAgent
-        
         # Create MCP configuration for time tools
-        config_file = "test_time_config.json"
         config = {
             "mcpServers": {
                 "time": {
@@ -248,13 +360,12 @@ async def test_chuk_agent_with_mcp():
             }
         }
         
-        # Write config file
-        with open(config_file, 'w') as f:
-            json.dump(config, f, indent=2)
-        print(f"✓ Created MCP config: {config_file}")
+        # Write config file; a unique name since the tests run concurrently
+        config_file = await asyncio.to_thread(_write_temp_json, config, 'test_time_config_')
+        p(f"✓ Created MCP config: {config_file}")
         
         # Create agent with MCP tools
-        agent = ChukAgent(
+        agent = _get_chuk_agent_cls()(
             name="time_agent",
             provider="openai",
             model="gpt-4o-mini",
@@ -265,163 +376,136 @@ async def test_chuk_agent_with_mcp():
             mcp_servers=["time"],
             tool_namespace="tools",
             enable_sessions=False,
-            debug_tools=False  # Keep it clean
+            debug_tools=False,  # Keep it clean
+            reuse_llm_client=True
         )
         
-        print(f"✓ Agent created with MCP: {agent.name}")
+        p(f"✓ Agent created with MCP: {agent.name}")
         
         # Test tool initialization
-        print("\n--- Testing Tool Initialization ---")
+        p("\n--- Testing Tool Initialization ---")
         await agent.initialize_tools()
         
         if agent._tools_initialized:
-            print("✓ Tools initialized successfully")
+            p("✓ Tools initialized successfully")
             
             # Get available tools
             tools = await agent.get_available_tools()
-            print(f"✓ Available tools: {tools}")
+            p(f"✓ Available tools: {tools}")
             
             # Test with tools
-            print("\n--- Testing Chat with Tools ---")
-            response = await agent.chat("What time is it in New York right now?")
-            print(f"✓ Tool-enabled response: '{response}'")
+            p("\n--- Testing Chat with Tools ---")
+            response = await _guarded(agent.chat("What time is it in New York right now?"))
+            p(f"✓ Tool-enabled response: '{response}'")
             
         else:
-            print("❌ Tools failed to initialize")
-            print("💡 Install with: uvx install mcp-server-time")
+            p("❌ Tools failed to initialize")
+            p("💡 Install with: uvx install mcp-server-time")
             
         # Clean up
-        Path(config_file).unlink(missing_ok=True)
+        await asyncio.to_thread(Path(config_file).unlink, missing_ok=True)
         return True
         
     except Exception as e:
-        print(f"❌ Error in MCP test: {e}")
+        p(f"❌ Error in MCP test: {e}")
         # Clean up
-        Path("test_time_config.json").unlink(missing_ok=True)
+        if config_file:
+            await asyncio.to_thread(Path(config_file).unlink, missing_ok=True)
         return False
 
-async def test_existing_agents():
+async def test_existing_agents(p=print):
     """Test the existing sample agents with proper evaluation."""
-    print("\n" + "="*60)
-    print("Testing Existing Sample Agents")
-    print("="*60)
+    p("\n" + "="*60)
+    p("Testing Existing Sample Agents")
+    p("="*60)
     
     test_results = []
+    agent_calls = []  # (agent_name, pending chat coroutine)
     
-    # Test time agent
-    try:
-        print("\n--- Testing time_agent ---")
-        from a2a_server.sample_agents.time_agent import time_agent
-        print(f"✓ time_agent loaded: {type(time_agent).__name__}")
-        
-        response = await time_agent.chat("What time is it?", session_id="test-session")
-        print(f"✓ time_agent response: '{response[:100]}{'...' if len(response) > 100 else ''}'")
-        
-        # Evaluate response
-        evaluation = evaluate_agent_response("time_agent", response)
-        status = "✅ SUCCESS" if evaluation["success"] else "❌ FAIL"
-        print(f"{status}: {evaluation['reason']}")
-        test_results.append(("time_agent", evaluation["success"]))
-        
-    except Exception as e:
-        print(f"❌ time_agent error: {e}")
-        test_results.append(("time_agent", False))
-    
-    # Test chef agent
-    try:
-        print("\n--- Testing chef_agent ---")
-        from a2a_server.sample_agents.chuk_chef import chef_agent
-        print(f"✓ chef_agent loaded: {type(chef_agent).__name__}")
-        
-        response = await chef_agent.chat("Give me a quick recipe for scrambled eggs", session_id="test-session")
-        print(f"✓ chef_agent response: '{response[:100]}{'...' if len(response) > 100 else ''}'")
-        
-        # Evaluate response
-        evaluation = evaluate_agent_response("chef_agent", response)
-        status = "✅ SUCCESS" if evaluation["success"] else "❌ FAIL"
-        print(f"{status}: {evaluation['reason']}")
-        test_results.append(("chef_agent", evaluation["success"]))
-        
-    except Exception as e:
-        print(f"❌ chef_agent error: {e}")
-        test_results.append(("chef_agent", False))
+    # Load every agent up front; a failure only affects that agent
+    sample_agents = [
+        ("time_agent", "What time is it?"),
+        ("chef_agent", "Give me a quick recipe for scrambled eggs"),
+        ("weather_agent", "What's the weather like?"),
+    ]
+    for agent_name, prompt in sample_agents:
+        try:
+            agent = _get_sample_agent(agent_name)
+            p(f"✓ {agent_name} loaded: {type(agent).__name__}")
+            agent_calls.append((agent_name, cached_chat(agent, prompt, session_id="test-session")))
+        except Exception as e:
+            p(f"❌ {agent_name} error: {e}")
+            test_results.append((agent_name, False))
     
-    # Test weather agent
+    # Perplexity agent (SSE)
+    perplexity_fallback = False
     try:
-        print("\n--- Testing weather_agent ---")
-        from a2a_server.sample_agents.weather_agent import weather_agent
-        print(f"✓ weather_agent loaded: {type(weather_agent).__name__}")
-        
-        response = await weather_agent.chat("What's the weather like?", session_id="test-session")
-        print(f"✓ weather_agent response: '{response[:100]}{'...' if len(response) > 100 else ''}'")
-        
-        # Evaluate response
-        evaluation = evaluate_agent_response("weather_agent", response)
-        status = "✅ SUCCESS" if evaluation["success"] else "❌ FAIL"
-        print(f"{status}: {evaluation['reason']}")
-        test_results.append(("weather_agent", evaluation["success"]))
-        
+        perplexity_agent = _get_sample_agent("perplexity_agent")
+        p(f"✓ perplexity_agent loaded: {type(perplexity_agent).__name__}")
+    except ImportError as ie:
+        p(f"⚠️ perplexity_agent import failed: {ie}")
+        p("ℹ️ Skipping perplexity agent test - module needs fixing")
+        test_results.append(("perplexity_agent", True))  # Don't fail the whole test
     except Exception as e:
-        print(f"❌ weather_agent error: {e}")
-        test_results.append(("weather_agent", False))
-    
-    # Test perplexity agent (SSE)
-    try:
-        print("\n--- Testing perplexity_agent (SSE) ---")
-        try:
-            from a2a_server.sample_agents.perplexity_agent import perplexity_agent
-            print(f"✓ perplexity_agent loaded: {type(perplexity_agent).__name__}")
-        except ImportError as ie:
-            print(f"⚠️ perplexity_agent import failed: {ie}")
-            print("ℹ️ Skipping perplexity agent test - module needs fixing")
-            test_results.append(("perplexity_agent", True))  # Don't fail the whole test
-            return test_results
-        
+        p(f"❌ perplexity_agent error: {e}")
+        test_results.append(("perplexity_agent", False))
+    else:
         # Check if MCP server URL is configured
         mcp_url = os.getenv('MCP_SERVER_URL')
         mcp_url_map = os.getenv('MCP_SERVER_URL_MAP')
         
         if mcp_url or mcp_url_map:
             if mcp_url:
-                print(f"✓ MCP server configured: {mcp_url[:50]}{'...' if len(mcp_url) > 50 else ''}")
+                p(f"✓ MCP server configured: {_snip(mcp_url, 50)}")
             else:
-                print(f"✓ MCP server map configured")
-            
-            response = await perplexity_agent.chat("What is artificial intelligence?", session_id="test-session")
-            print(f"✓ perplexity_agent response: '{response[:100]}{'...' if len(response) > 100 else ''}'")
-            
-            # Evaluate response - look for research-like behavior
-            evaluation = evaluate_agent_response("perplexity_agent", response)
-            status = "✅ SUCCESS" if evaluation["success"] else "❌ FAIL"
-            print(f"{status}: {evaluation['reason']}")
-            test_results.append(("perplexity_agent", evaluation["success"]))
+                p(f"✓ MCP server map configured")
+            prompt = "What is artificial intelligence?"
         else:
-            print("ℹ️ MCP_SERVER_URL not configured - testing fallback mode")
-            response = await perplexity_agent.chat("Tell me about artificial intelligence", session_id="test-session")
-            print(f"✓ perplexity_agent fallback response: '{response[:100]}{'...' if len(response) > 100 else ''}'")
+            p("ℹ️ MCP_SERVER_URL not configured - testing fallback mode")
+            perplexity_fallback = True
+            prompt = "Tell me about artificial intelligence"
+        agent_calls.append(("perplexity_agent", cached_chat(perplexity_agent, prompt, session_id="test-session")))
+    
+    # The agents share no state, so chat with all of them concurrently
+    responses = await asyncio.gather(*(call for _, call in agent_calls), return_exceptions=True)
+    
+    for (agent_name, _), response in zip(agent_calls, responses):
+        p(f"\n--- Testing {agent_name} ---")
+        if isinstance(response, Exception):
+            p(f"❌ {agent_name} error: {response}")
+            test_results.append((agent_name, False))
+            continue
+        
+        if agent_name == "perplexity_agent" and perplexity_fallback:
+            p(f"✓ perplexity_agent fallback response: '{_snip(response)}'")
             
             # In fallback mode, any substantial response is success
             if len(response.strip()) > 50:
-                print("✅ SUCCESS: Provided fallback response")
+                p("✅ SUCCESS: Provided fallback response")
                 test_results.append(("perplexity_agent", True))
             else:
-                print("❌ FAIL: Poor fallback response")
+                p("❌ FAIL: Poor fallback response")
                 test_results.append(("perplexity_agent", False))
+            continue
         
-    except Exception as e:
-        print(f"❌ perplexity_agent error: {e}")
-        test_results.append(("perplexity_agent", False))
+        p(f"✓ {agent_name} response: '{_snip(response)}'")
+        
+        # Evaluate response
+        evaluation = evaluate_agent_response(agent_name, response)
+        status = "✅ SUCCESS" if evaluation["success"] else "❌ FAIL"
+        p(f"{status}: {evaluation['reason']}")
+        test_results.append((agent_name, evaluation["success"]))
     
     # Calculate overall success
     total_tests = len(test_results)
     passed_tests = sum(1 for _, success in test_results if success)
     
-    print(f"\n--- Sample Agents Summary ---")
+    p(f"\n--- Sample Agents Summary ---")
     for agent_name, success in test_results:
         status = "✅ PASS" if success else "❌ FAIL"
-        print(f"{status} {agent_name}")
+        p(f"{status} {agent_name}")
     
-    print(f"Sample agents passed: {passed_tests}/{total_tests}")
+    p(f"Sample agents passed: {passed_tests}/{total_tests}")
     
     # Return True if all agents passed
     return passed_tests == total_tests
@@ -448,15 +532,17 @@ async def main():
         ("Existing Sample Agents", test_existing_agents)
     ]
     
+    # The tests are independent, so run them concurrently; each prints its own
+    # banner into a buffer that is written out when the test finishes
+    outcomes = await asyncio.gather(*(_run_buffered(test_func) for _, test_func in tests), return_exceptions=True)
+    
     results = []
-    for test_name, test_func in tests:
-        try:
-            print(f"\n{'='*20} {test_name} {'='*20}")
-            success = await test_func()
-            results.append((test_name, success))
-        except Exception as e:
-            print(f"❌ Test '{test_name}' failed with exception: {e}")
+    for (test_name, _), outcome in zip(tests, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"❌ Test '{test_name}' failed with exception: {outcome}")
             results.append((test_name, False))
+        else:
+            results.append((test_name, outcome))
     
     # Summary
     print("\n" + "="*60)
@@ -477,4 +563,10 @@ async def main():
         print("💡 Some tests need attention, but core functionality is working.")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # uvloop's C event loop cuts per-await overhead when it is installed
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
\ No newline at end of file
@@ -6,31 +6,68 @@ A2A Google ADK Agent Server Example
 This example launches an A2A server by passing a raw Google ADK `Agent`
 directly into the handler; no manual adapter import or `use_handler_discovery`
 flag is needed.
-"""
-import uvicorn
 
-# a2a imports
-from a2a_server.app import create_app
-from a2a_server.tasks.handlers.adk.google_adk_handler import GoogleADKHandler
+Usage:
+    python google_adk_pirate_agent.py [--workers N]
+
+    or, under gunicorn from the examples directory:
+    gunicorn -k uvicorn.workers.UvicornWorker -w N "google_adk_pirate_agent:build_app()"
+"""
 
-# import the sample agent
-from a2a_server.sample_agents.pirate_agent import pirate_agent as agent
+import argparse
+from pathlib import Path
 
 # constants
 HOST = "0.0.0.0"
 PORT = 8000
 
-def main():
+def build_app():
+    """App factory; each uvicorn worker process calls it after forking."""
+    # Heavy imports are deferred so importing this module stays cheap
+    # a2a imports
+    from a2a_server.app import create_app
+    from a2a_server.tasks.handlers.adk.google_adk_handler import GoogleADKHandler
+
+    # import the sample agent
+    from a2a_server.sample_agents.pirate_agent import pirate_agent as agent
+
     # Instantiate the handler directly with the raw ADK agent
     handler = GoogleADKHandler(agent)
 
     # Create the FastAPI app with just this handler
-    app = create_app(
+    return create_app(
         handlers=[handler]
     )
 
-    # Launch the server
-    uvicorn.run(app, host=HOST, port=PORT)
+def main():
+    parser = argparse.ArgumentParser(description="A2A Google ADK pirate agent server")
+    # Sessions live in process memory, so extra workers do not share them
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of uvicorn worker processes (default: 1)")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    # uvloop's C event loop is used when installed; httptools is a dependency
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+
+    # Workers need an import string, not an app instance, so point uvicorn
+    # at this file's factory
+    uvicorn.run(
+        f"{Path(__file__).stem}:build_app",
+        factory=True,
+        app_dir=str(Path(__file__).parent),
+        workers=args.workers,
+        host=HOST,
+        port=PORT,
+        loop=loop,
+        http="httptools",
+        access_log=False,
+    )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -7,31 +7,56 @@ This script demonstrates how to run a production-ready resilient agent
 that can handle MCP failures, agent crashes, and other real-world issues.
 
 Usage:
-    python production_agent.py [--config config.yaml] [--demo]
+    python production_agent.py [--config config.yaml] [--demo [--serial]] [--config-cache]
 """
 
 import asyncio
 import argparse
+import atexit
 import logging
+import logging.handlers
 import os
+import pickle
+import queue
 import signal
+import tempfile
 import sys
 import time
 from pathlib import Path
 from typing import Dict, Any, Optional
-import yaml
 
-# Setup logging
+# Setup logging; file writes go through a queue to a background thread so
+# they never block the event loop
+_log_queue = queue.SimpleQueue()
+_file_handler = logging.FileHandler('resilient_agent.log')
+_file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_log_listener = logging.handlers.QueueListener(_log_queue, _file_handler, respect_handler_level=True)
+_log_listener.start()
+# Stopping at exit flushes records logged after the manager shuts down
+atexit.register(_log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('resilient_agent.log')
-    ]
+    handlers=[logging.StreamHandler()]
 )
+# Added after basicConfig so records are formatted once, by the file handler
+logging.getLogger().addHandler(logging.handlers.QueueHandler(_log_queue))
 logger = logging.getLogger(__name__)
 
+# Shared by every request; downstream code only reads it, so it is never copied
+_SYSTEM_MSG = {"role": "system", "content": "You are a helpful and resilient AI assistant."}
+
+
+def _load_yaml(stream) -> Any:
+    """Parse YAML, importing PyYAML only once a config is actually read."""
+    import yaml
+    try:
+        from yaml import CSafeLoader as _YamlLoader  # libyaml bindings
+    except ImportError:  # PyYAML built without libyaml
+        from yaml import SafeLoader as _YamlLoader
+    return yaml.load(stream, Loader=_YamlLoader)
+
 
 def create_production_agent(**config) -> 'ChukAgent':
     """
@@ -41,7 +66,7 @@ def create_production_agent(**config) -> 'ChukAgent':
     try:
         from a2a_server.tasks.handlers.chuk.chuk_agent import ChukAgent
         
-        logger.info(f"Creating production agent: {config.get('name', 'unnamed')}")
+        logger.info("Creating production agent: %s", config.get('name', 'unnamed'))
         
         # Create agent with production settings
         agent = ChukAgent(
@@ -69,15 +94,15 @@ def create_production_agent(**config) -> 'ChukAgent':
             max_turns_per_segment=config.get('max_turns_per_segment', 50)
         )
         
-        logger.info(f"✅ Production agent created successfully: {agent.name}")
+        logger.info("✅ Production agent created successfully: %s", agent.name)
         return agent
         
     except ImportError as e:
-        logger.error(f"❌ Failed to import ChukAgent: {e}")
+        logger.error("❌ Failed to import ChukAgent: %s", e)
         # Return a mock agent for demonstration
         return MockProductionAgent(**config)
     except Exception as e:
-        logger.error(f"❌ Failed to create production agent: {e}")
+        logger.error("❌ Failed to create production agent: %s", e)
         raise
 
 
@@ -100,11 +125,11 @@ class MockProductionAgent:
         if self.failure_simulation and self.call_count % 8 == 0:
             raise ConnectionError("Simulated MCP connection failure")
         
-        user_content = "test"
-        for msg in messages:
-            if msg.get('role') == 'user':
-                user_content = msg.get('content', 'test')
-                break
+        # The turn being answered is the latest user message, usually the last
+        user_content = next(
+            (msg.get('content', 'test') for msg in reversed(messages) if msg.get('role') == 'user'),
+            "test"
+        )
         
         return {
             "content": f"Mock response from {self.name}: {user_content}",
@@ -133,33 +158,76 @@ class ProductionAgentManager:
     Manages a production agent with monitoring, health checks, and recovery.
     """
     
-    def __init__(self, config_path: str):
+    def __init__(self, config_path: str, use_config_cache: bool = False):
         self.config_path = config_path
+        self.use_config_cache = use_config_cache
         self.config = self.load_config()
         self.agent = None
         self.handler = None
         self.running = False
+        self._stop_event = asyncio.Event()
         self.health_check_task = None
         self.stats = {
             "requests_processed": 0,
             "errors_encountered": 0,
             "circuit_breaker_opens": 0,
             "recovery_attempts": 0,
-            "uptime_start": time.time()
+            "uptime_start": time.monotonic()
         }
     
     def load_config(self) -> Dict[str, Any]:
         """Load configuration from YAML file."""
         try:
-            with open(self.config_path, 'r') as f:
-                config = yaml.safe_load(f)
-            logger.info(f"✅ Configuration loaded from {self.config_path}")
+            if self.use_config_cache:
+                config = self._load_config_cached()
+            else:
+                with open(self.config_path, 'rb') as f:
+                    config = _load_yaml(f)
+            logger.info("✅ Configuration loaded from %s", self.config_path)
             return config
         except Exception as e:
-            logger.error(f"❌ Failed to load config from {self.config_path}: {e}")
+            logger.error("❌ Failed to load config from %s: %s", self.config_path, e)
             # Return default configuration
             return self.get_default_config()
     
+    def _load_config_cached(self) -> Dict[str, Any]:
+        """
+        Load the YAML config through a pickle cache stored next to it.
+        
+        The cache is keyed on the file's mtime and size, so editing the YAML
+        invalidates it and restarts skip the YAML parse entirely. Unpickling
+        runs code, so only enable this for a config directory you trust.
+        """
+        stat = os.stat(self.config_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cache_path = f"{self.config_path}.cache.pkl"
+        
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_stamp, config = pickle.load(f)
+            if cached_stamp == stamp:
+                return config
+        except Exception:
+            # Missing, stale-format or corrupt cache: re-read the YAML
+            pass
+        
+        with open(self.config_path, 'rb') as f:
+            config = _load_yaml(f)
+        
+        # Write to a temp file and rename so readers never see a partial cache
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or ".", suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((stamp, config), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.debug("Could not write config cache %s: %s", cache_path, e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        
+        return config
+    
     def get_default_config(self) -> Dict[str, Any]:
         """Get default configuration when file loading fails."""
         return {
@@ -205,10 +273,10 @@ class ProductionAgentManager:
                 logger.warning("⚠️ ChukAgentHandler not available, using agent directly")
                 self.handler = self.agent
             
-            logger.info(f"✅ Agent system initialized: {self.agent.name}")
+            logger.info("✅ Agent system initialized: %s", self.agent.name)
             
         except Exception as e:
-            logger.error(f"❌ Failed to initialize agent: {e}")
+            logger.error("❌ Failed to initialize agent: %s", e)
             raise
     
     async def start_health_monitoring(self):
@@ -218,43 +286,48 @@ class ProductionAgentManager:
             
             while self.running:
                 try:
-                    # Check agent health
-                    if hasattr(self.agent, 'get_health_status'):
-                        health = self.agent.get_health_status()
-                        logger.debug(f"🏥 Agent health: {health}")
-                    
-                    # Check handler health if available
-                    if hasattr(self.handler, 'get_health_status') and self.handler != self.agent:
-                        handler_health = self.handler.get_health_status()
-                        logger.debug(f"🏥 Handler health: {handler_health}")
+                    # Health snapshots are only logged, so skip building them
+                    # unless debug output is on
+                    if logger.isEnabledFor(logging.DEBUG):
+                        # Check agent health
+                        if hasattr(self.agent, 'get_health_status'):
+                            logger.debug("🏥 Agent health: %r", self.agent.get_health_status())
+                        
+                        # Check handler health if available
+                        if hasattr(self.handler, 'get_health_status') and self.handler != self.agent:
+                            logger.debug("🏥 Handler health: %r", self.handler.get_health_status())
                     
                     # Log system stats
-                    uptime = time.time() - self.stats["uptime_start"]
-                    logger.info(f"📊 System stats: {self.stats['requests_processed']} requests, "
-                              f"{self.stats['errors_encountered']} errors, "
-                              f"{uptime:.1f}s uptime")
+                    uptime = time.monotonic() - self.stats["uptime_start"]
+                    logger.info("📊 System stats: %d requests, %d errors, %.1fs uptime",
+                                self.stats['requests_processed'],
+                                self.stats['errors_encountered'],
+                                uptime)
                     
                 except Exception as e:
-                    logger.error(f"❌ Health check failed: {e}")
+                    logger.error("❌ Health check failed: %s", e)
                     self.stats["errors_encountered"] += 1
                 
-                await asyncio.sleep(interval)
+                # Sleep until the next check, but wake at once on shutdown
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    return
         
         self.health_check_task = asyncio.create_task(health_check_loop())
         logger.info("🏥 Health monitoring started")
     
     async def process_request(self, user_message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """Process a user request with error handling and monitoring."""
-        start_time = time.time()
+        start_time = time.monotonic()
         
         try:
             self.stats["requests_processed"] += 1
             
             # Prepare messages
-            messages = [
-                {"role": "system", "content": "You are a helpful and resilient AI assistant."},
-                {"role": "user", "content": user_message}
-            ]
+            messages = [_SYSTEM_MSG, {"role": "user", "content": user_message}]
             
             # Process through handler if available, otherwise direct to agent
             if hasattr(self.handler, 'process_task'):
@@ -266,28 +339,24 @@ class ProductionAgentManager:
                     parts=[TextPart(type="text", text=user_message)]
                 )
                 
-                # Collect events from handler
-                events = []
+                # Read the response text as events arrive; the last artifact wins
+                response_content = "Task completed"
                 async for event in self.handler.process_task(
                     f"req_{self.stats['requests_processed']}", 
                     a2a_message, 
                     session_id
                 ):
-                    events.append(event)
-                
-                # Extract final response from events
-                response_content = "Task completed"
-                for event in events:
-                    if hasattr(event, 'artifact') and event.artifact:
-                        for part in event.artifact.parts:
-                            if hasattr(part, 'text'):
-                                response_content = part.text
-                                break
-                            elif hasattr(part, 'model_dump'):
-                                part_data = part.model_dump()
-                                if 'text' in part_data:
-                                    response_content = part_data['text']
-                                    break
+                    artifact = getattr(event, 'artifact', None)
+                    if not artifact:
+                        continue
+                    for part in artifact.parts:
+                        text = getattr(part, 'text', None)
+                        # RootModel-wrapped parts keep their fields on .root
+                        if text is None and hasattr(part, 'root'):
+                            text = getattr(part.root, 'text', None)
+                        if text is not None:
+                            response_content = text
+                            break
                 
                 result = {"content": response_content}
                 
@@ -295,8 +364,8 @@ class ProductionAgentManager:
                 # Use direct agent interface
                 result = await self.agent.complete(messages, session_id=session_id)
             
-            processing_time = time.time() - start_time
-            logger.info(f"✅ Request processed in {processing_time:.2f}s")
+            processing_time = time.monotonic() - start_time
+            logger.info("✅ Request processed in %.2fs", processing_time)
             
             return {
                 "success": True,
@@ -308,9 +377,9 @@ class ProductionAgentManager:
             
         except Exception as e:
             self.stats["errors_encountered"] += 1
-            processing_time = time.time() - start_time
+            processing_time = time.monotonic() - start_time
             
-            logger.error(f"❌ Request failed after {processing_time:.2f}s: {e}")
+            logger.error("❌ Request failed after %.2fs: %s", processing_time, e)
             
             return {
                 "success": False,
@@ -319,8 +388,13 @@ class ProductionAgentManager:
                 "session_id": session_id
             }
     
-    async def run_demo_scenario(self):
-        """Run a demonstration of resilient behavior."""
+    async def run_demo_scenario(self, serial: bool = False):
+        """
+        Run a demonstration of resilient behavior.
+        
+        Requests run concurrently, bounded by the agent's max_concurrency;
+        ``serial`` sends them one at a time with a pause in between instead.
+        """
         logger.info("🎭 Starting resilient agent demonstration...")
         
         # Enable failure simulation if using mock agent
@@ -341,25 +415,33 @@ class ProductionAgentManager:
         ]
         
         session_id = "demo_session_123"
+        semaphore = asyncio.Semaphore(self.config.get('agent_config', {}).get('max_concurrency', 3))
         
-        for i, request in enumerate(demo_requests):
-            logger.info(f"🔄 Demo request {i + 1}: {request}")
-            
-            result = await self.process_request(request, session_id)
+        async def run_one(i: int, request: str):
+            async with semaphore:
+                logger.info("🔄 Demo request %d: %s", i + 1, request)
+                result = await self.process_request(request, session_id)
             
             if result["success"]:
-                logger.info(f"✅ Response: {result['response'][:100]}...")
+                logger.info("✅ Response: %.100s...", result['response'])
             else:
-                logger.warning(f"❌ Failed: {result['error']}")
-            
-            # Brief pause between requests
-            await asyncio.sleep(2)
+                logger.warning("❌ Failed: %s", result['error'])
+        
+        if serial:
+            for i, request in enumerate(demo_requests):
+                await run_one(i, request)
+                
+                # Brief pause between requests
+                await asyncio.sleep(2)
+        else:
+            await asyncio.gather(*(run_one(i, request) for i, request in enumerate(demo_requests)))
         
         logger.info("🎉 Demo completed!")
         
         # Print final stats
-        uptime = time.time() - self.stats["uptime_start"]
-        success_rate = (self.stats["requests_processed"] - self.stats["errors_encountered"]) / self.stats["requests_processed"] * 100
+        uptime = time.monotonic() - self.stats["uptime_start"]
+        processed = self.stats["requests_processed"] or 1  # avoid dividing by zero
+        success_rate = (self.stats["requests_processed"] - self.stats["errors_encountered"]) / processed * 100
         
         print(f"\n📊 FINAL STATISTICS:")
         print(f"  Requests processed: {self.stats['requests_processed']}")
@@ -367,7 +449,7 @@ class ProductionAgentManager:
         print(f"  Success rate: {success_rate:.1f}%")
         print(f"  Total uptime: {uptime:.1f} seconds")
     
-    async def start(self, demo_mode: bool = False):
+    async def start(self, demo_mode: bool = False, serial_demo: bool = False):
         """Start the agent manager."""
         logger.info("🚀 Starting production agent manager...")
         
@@ -381,21 +463,23 @@ class ProductionAgentManager:
             
             if demo_mode:
                 # Run demonstration
-                await self.run_demo_scenario()
+                await self.run_demo_scenario(serial=serial_demo)
             else:
                 # Run in production mode (would typically listen for requests)
                 logger.info("🔄 Agent running in production mode...")
                 logger.info("   (In real deployment, this would handle incoming requests)")
                 
-                # Simple example loop
+                # Simple example loop; shutdown() ends the wait immediately
                 while self.running:
-                    await asyncio.sleep(10)
-                    logger.info("💓 Agent heartbeat - system running normally")
+                    try:
+                        await asyncio.wait_for(self._stop_event.wait(), timeout=10)
+                    except asyncio.TimeoutError:
+                        logger.info("💓 Agent heartbeat - system running normally")
             
         except KeyboardInterrupt:
             logger.info("👋 Shutdown requested by user")
         except Exception as e:
-            logger.error(f"❌ Agent manager failed: {e}")
+            logger.error("❌ Agent manager failed: %s", e)
             raise
         finally:
             await self.shutdown()
@@ -405,6 +489,7 @@ class ProductionAgentManager:
         logger.info("🛑 Shutting down agent manager...")
         
         self.running = False
+        self._stop_event.set()
         
         # Cancel health monitoring
         if self.health_check_task:
@@ -419,7 +504,7 @@ class ProductionAgentManager:
             try:
                 await self.agent.shutdown()
             except Exception as e:
-                logger.warning(f"⚠️ Agent shutdown error: {e}")
+                logger.warning("⚠️ Agent shutdown error: %s", e)
         
         logger.info("✅ Agent manager shutdown complete")
 
@@ -431,6 +516,10 @@ async def main():
                        help="Configuration file path")
     parser.add_argument("--demo", action="store_true", 
                        help="Run in demonstration mode")
+    parser.add_argument("--serial", action="store_true",
+                       help="Send demo requests one at a time instead of concurrently")
+    parser.add_argument("--config-cache", action="store_true",
+                       help="Cache the parsed config in <config>.cache.pkl (trusted directories only)")
     
     args = parser.parse_args()
     
@@ -438,7 +527,7 @@ async def main():
     manager = None
     
     def signal_handler(signum, frame):
-        logger.info(f"Received signal {signum}")
+        logger.info("Received signal %s", signum)
         if manager:
             asyncio.create_task(manager.shutdown())
     
@@ -446,10 +535,10 @@ async def main():
     signal.signal(signal.SIGTERM, signal_handler)
     
     try:
-        manager = ProductionAgentManager(args.config)
-        await manager.start(demo_mode=args.demo)
+        manager = ProductionAgentManager(args.config, use_config_cache=args.config_cache)
+        await manager.start(demo_mode=args.demo, serial_demo=args.serial)
     except Exception as e:
-        logger.error(f"❌ Production agent failed: {e}")
+        logger.error("❌ Production agent failed: %s", e)
         sys.exit(1)
 
 
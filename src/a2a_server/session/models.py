@@ -6,7 +6,6 @@ Data models for image artifacts and related session objects.
 Contains the core data structures used by the image session management system.
 """
 
-import base64
 import hashlib
 import json
 from datetime import datetime
@@ -15,6 +14,31 @@ from dataclasses import dataclass, field
 
 from a2a_json_rpc.spec import Artifact, TextPart
 
+# ImagePart is missing from older a2a_json_rpc releases
+try:
+    from a2a_json_rpc.spec import ImagePart
+except ImportError:
+    ImagePart = None
+
+# SIMD base64 decoding when pybase64 is installed (optional)
+try:
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
+
+# Magic bytes of the supported image formats, checked in one startswith call
+IMAGE_HEADERS = (
+    b'\xff\xd8\xff',  # JPEG
+    b'\x89PNG\r\n\x1a\n',  # PNG
+    b'GIF87a',  # GIF87a
+    b'GIF89a',  # GIF89a
+    b'RIFF',  # WebP (starts with RIFF)
+)
+
+def _text_part(text: str) -> TextPart:
+    """Build a TextPart from trusted internal text without re-validation."""
+    return TextPart.model_construct(type="text", text=text)
+
 @dataclass
 class ImageArtifact:
     """Represents an image artifact with metadata and summary."""
@@ -63,40 +87,29 @@ class ImageArtifact:
         
         # Always include summary if available
         if self.summary:
-            parts.append(TextPart(
-                type="text",
-                text=f"Image Summary: {self.summary}"
-            ))
+            parts.append(_text_part(f"Image Summary: {self.summary}"))
         
         # Include tags and metadata
         if self.tags:
-            parts.append(TextPart(
-                type="text", 
-                text=f"Tags: {', '.join(self.tags)}"
-            ))
+            parts.append(_text_part(f"Tags: {', '.join(self.tags)}"))
         
         # Include description if available
         if self.description:
-            parts.append(TextPart(
-                type="text",
-                text=f"Source: {self.description}"
-            ))
+            parts.append(_text_part(f"Source: {self.description}"))
         
         # Conditionally include full image
         if include_full_image:
-            try:
-                from a2a_json_rpc.spec import ImagePart
+            if ImagePart is not None:
                 parts.append(ImagePart(
                     type="image",
                     data=self.image_data,
                     format=self.format,
                     mime_type=self.mime_type
                 ))
-            except ImportError:
+            else:
                 # Fallback if ImagePart doesn't exist
-                parts.append(TextPart(
-                    type="text",
-                    text=f"[Image: {self.mime_type}, {len(self.image_data)} chars base64 data]"
+                parts.append(_text_part(
+                    f"[Image: {self.mime_type}, {len(self.image_data)} chars base64 data]"
                 ))
         
         return Artifact(
@@ -142,18 +155,10 @@ class ImageArtifact:
             
         try:
             # Try to decode
-            decoded = base64.b64decode(self.image_data)
+            decoded = b64decode(self.image_data)
             
             # Check for common image headers
-            image_headers = [
-                b'\xff\xd8\xff',  # JPEG
-                b'\x89PNG\r\n\x1a\n',  # PNG
-                b'GIF87a',  # GIF87a
-                b'GIF89a',  # GIF89a
-                b'RIFF',  # WebP (starts with RIFF)
-            ]
-            
-            return any(decoded.startswith(header) for header in image_headers)
+            return decoded.startswith(IMAGE_HEADERS)
             
         except Exception:
             return False
@@ -303,29 +308,34 @@ def extract_image_from_tool_response(response: str) -> Optional[str]:
     try:
         # Try to parse as JSON first
         data = json.loads(response)
-        
-        # Look for common image fields
-        for field in ['image', 'image_data', 'base64', 'data', 'content']:
-            if field in data and isinstance(data[field], str):
-                # Validate it looks like base64
-                candidate = data[field]
-                if is_base64_image(candidate):
-                    return candidate
-        
-        # Look for data URLs
-        if 'url' in data and data['url'].startswith('data:image'):
-            # Extract base64 part from data URL
-            if ',' in data['url']:
-                return data['url'].split(',', 1)[1]
-                
     except json.JSONDecodeError:
-        # Try to find base64 data in raw response
-        lines = response.split('\n')
-        for line in lines:
-            line = line.strip()
-            if is_base64_image(line):
-                return line
+        return _extract_image_from_lines(response)
+    return _extract_image_from_data(data)
+
+def _extract_image_from_data(data: Any) -> Optional[str]:
+    """Extract base64 image data from a parsed JSON tool response."""
+    # Look for common image fields
+    for field in ['image', 'image_data', 'base64', 'data', 'content']:
+        if field in data and isinstance(data[field], str):
+            # Validate it looks like base64
+            candidate = data[field]
+            if is_base64_image(candidate):
+                return candidate
     
+    # Look for data URLs
+    if 'url' in data and data['url'].startswith('data:image'):
+        # Extract base64 part from data URL
+        if ',' in data['url']:
+            return data['url'].split(',', 1)[1]
+    
+    return None
+
+def _extract_image_from_lines(response: str) -> Optional[str]:
+    """Find base64 image data on its own line of a non-JSON response."""
+    for line in response.split('\n'):
+        line = line.strip()
+        if is_base64_image(line):
+            return line
     return None
 
 def is_base64_image(data: str) -> bool:
@@ -335,18 +345,10 @@ def is_base64_image(data: str) -> bool:
         
     try:
         # Try to decode
-        decoded = base64.b64decode(data)
+        decoded = b64decode(data)
         
         # Check for common image headers
-        image_headers = [
-            b'\xff\xd8\xff',  # JPEG
-            b'\x89PNG\r\n\x1a\n',  # PNG
-            b'GIF87a',  # GIF87a
-            b'GIF89a',  # GIF89a
-            b'RIFF',  # WebP (starts with RIFF)
-        ]
-        
-        return any(decoded.startswith(header) for header in image_headers)
+        return decoded.startswith(IMAGE_HEADERS)
         
     except Exception:
         return False
@@ -357,20 +359,28 @@ def create_image_artifact_from_tool(
     description: Optional[str] = None
 ) -> Optional[ImageArtifact]:
     """Create ImageArtifact from tool response."""
-    image_data = extract_image_from_tool_response(tool_response)
+    # Parse once; the image and its format come from the same payload
+    try:
+        data = json.loads(tool_response)
+    except json.JSONDecodeError:
+        image_data = _extract_image_from_lines(tool_response)
+        is_json = False
+    else:
+        image_data = _extract_image_from_data(data)
+        is_json = True
     if not image_data:
         return None
     
     # Try to determine mime type from tool response
     mime_type = "image/jpeg"  # default
-    try:
-        data = json.loads(tool_response)
-        if 'format' in data:
-            format_str = data['format'].lower()
-            if format_str in ['png', 'jpeg', 'jpg', 'gif', 'webp']:
-                mime_type = f"image/{format_str.replace('jpg', 'jpeg')}"
-    except:
-        pass
+    if is_json:
+        try:
+            if 'format' in data:
+                format_str = data['format'].lower()
+                if format_str in ['png', 'jpeg', 'jpg', 'gif', 'webp']:
+                    mime_type = f"image/{format_str.replace('jpg', 'jpeg')}"
+        except Exception:
+            pass
     
     return ImageArtifact(
         image_data=image_data,
@@ -8,7 +8,8 @@ complex lifecycle management that was causing duplicate task creation.
 """
 import logging
 import asyncio
-from typing import Optional, Dict, Any, AsyncGenerator
+import weakref
+from typing import Optional, Dict, Any, AsyncGenerator, Callable
 
 from a2a_server.tasks.handlers.session_aware_task_handler import SessionAwareTaskHandler
 from a2a_json_rpc.spec import (
@@ -19,6 +20,57 @@ from a2a_json_rpc.spec import (
 logger = logging.getLogger(__name__)
 
 
+def _text_from_attr(part: Any) -> Any:
+    return part.text
+
+
+def _text_from_attr_or_dump(part: Any) -> Any:
+    # An empty .text falls through to model_dump, as per-part probing did
+    return part.text or part.model_dump().get("text")
+
+
+def _text_from_item(part: Any) -> Any:
+    try:
+        return part["text"]
+    except (KeyError, TypeError):
+        return None
+
+
+def _probe_part_text(part: Any) -> Any:
+    # Per-part probing for classes whose instances may or may not carry .text
+    if hasattr(part, "text") and part.text:
+        return part.text
+    if hasattr(part, "model_dump"):
+        return part.model_dump().get("text")
+    if hasattr(part, "__getitem__"):
+        return _text_from_item(part)
+    return None
+
+
+def _declares_text(cls: type) -> bool:
+    """True when every instance of *cls* has ``text`` (field or class attribute)."""
+    return "text" in (getattr(cls, "model_fields", None) or ()) or hasattr(cls, "text")
+
+
+# Part classes repeat across messages, so the probing runs once per class when
+# the class itself declares ``text``; other classes keep probing each part.
+# Weak keys let short-lived classes drop out of the cache
+_PART_TEXT_EXTRACTORS: "weakref.WeakKeyDictionary[type, Callable[[Any], Any]]" = weakref.WeakKeyDictionary()
+
+
+def _part_text_extractor(part: Any) -> Callable[[Any], Any]:
+    """Return the cached text extractor for the part's class."""
+    cls = type(part)
+    extractor = _PART_TEXT_EXTRACTORS.get(cls)
+    if extractor is None:
+        if _declares_text(cls):
+            extractor = _text_from_attr_or_dump if hasattr(cls, "model_dump") else _text_from_attr
+        else:
+            extractor = _probe_part_text
+        _PART_TEXT_EXTRACTORS[cls] = extractor
+    return extractor
+
+
 class GoogleADKHandler(SessionAwareTaskHandler):
     """
     Clean Google ADK Handler with auto-expiring sessions.
@@ -149,22 +201,9 @@ class GoogleADKHandler(SessionAwareTaskHandler):
         text_parts = []
         for part in message.parts:
             try:
-                # Try direct text attribute first
-                if hasattr(part, "text") and part.text:
-                    text_parts.append(str(part.text))
-                # Try model_dump if available
-                elif hasattr(part, "model_dump"):
-                    part_dict = part.model_dump()
-                    if "text" in part_dict and part_dict["text"]:
-                        text_parts.append(str(part_dict["text"]))
-                # Try dict-like access
-                elif hasattr(part, '__getitem__'):
-                    try:
-                        text = part["text"]
-                        if text:
-                            text_parts.append(str(text))
-                    except (KeyError, TypeError):
-                        pass
+                text = _part_text_extractor(part)(part)
+                if text:
+                    text_parts.append(str(text))
             except Exception as e:
                 logger.debug(f"Error extracting text from part {type(part)}: {e}")
                 continue
@@ -68,6 +68,7 @@ class ChukAgent:
         
         # Other options
         streaming: bool = False,
+        reuse_llm_client: bool = False,
         **kwargs
     ):
         """Initialize ChukAgent with comprehensive debugging."""
@@ -83,6 +84,10 @@ class ChukAgent:
         self.enable_tools = enable_tools
         self.debug_tools = debug_tools
         
+        # One LLM client (and its connection pool) per agent when reuse is on
+        self.reuse_llm_client = reuse_llm_client
+        self._llm_client = None
+        
         # MCP configuration
         self.mcp_config_file = mcp_config_file
         self.mcp_servers = mcp_servers or []
@@ -170,7 +175,11 @@ class ChukAgent:
 
     async def get_llm_client(self):
         """Get LLM client for this agent."""
-        return get_client(provider=self.provider, model=self.model)
+        if not self.reuse_llm_client:
+            return get_client(provider=self.provider, model=self.model)
+        if self._llm_client is None:
+            self._llm_client = get_client(provider=self.provider, model=self.model)
+        return self._llm_client
 
     def _extract_response_content(self, response) -> str:
         """Extract content from chuk_llm response with null safety."""
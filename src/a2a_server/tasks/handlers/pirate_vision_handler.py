@@ -28,6 +28,10 @@ from a2a_server.tasks.handlers.task_handler import TaskHandler
 class PirateVisionHandler(TaskHandler):
     """Accept an image, then stream back pirate commentary."""
 
+    # Simulated latency in seconds; set to 0 to stream without pauses
+    analysis_delay: float = 0.3
+    line_delay: float = 0.2
+
     @property
     def name(self) -> str:  # noqa: D401
         return "pirate_vision"
@@ -47,7 +51,8 @@ class PirateVisionHandler(TaskHandler):
         )
 
         # pretend we are analysing the picture
-        await asyncio.sleep(0.3)
+        if self.analysis_delay:
+            await asyncio.sleep(self.analysis_delay)
 
         pirate_lines = [
             "Arrr, I spy a majestic beast o' legend!",
@@ -63,7 +68,8 @@ class PirateVisionHandler(TaskHandler):
                 parts=[TextPart(type="text", text=line)],
             )
             yield TaskArtifactUpdateEvent(id=task_id, artifact=artifact)
-            await asyncio.sleep(0.2)
+            if self.line_delay:
+                await asyncio.sleep(self.line_delay)
 
         # ── completed ───────────────────────────────────────────────
         yield TaskStatusUpdateEvent(
@@ -426,4 +426,90 @@
 #     agent = MockGoogleADKAgent()
 #     result = agent.invoke("test")
 #     print(f"Mock agent test: {result}")
-#     print("Manual test completed!")
\ No newline at end of file
+#     print("Manual test completed!")
+
+# ---------------------------------------------------------------------------
+# Part text extraction (per-class extractor cache)
+# ---------------------------------------------------------------------------
+from types import SimpleNamespace
+
+import pytest
+from pydantic import BaseModel, ConfigDict, RootModel
+
+from a2a_json_rpc.spec import TextPart
+from a2a_server.tasks.handlers.adk.google_adk_handler import (
+    GoogleADKHandler,
+    _PART_TEXT_EXTRACTORS,
+    _part_text_extractor,
+    _probe_part_text,
+)
+
+
+class Part(RootModel[TextPart]):
+    """RootModel wrapper, as union ``Part`` types deliver text parts."""
+
+
+class DumpOnlyText:
+    """Part whose ``text`` is empty but whose dump carries the text."""
+
+    text = ""
+
+    def model_dump(self):
+        return {"type": "text", "text": "from dump"}
+
+
+@pytest.fixture
+def extract():
+    # _extract_message_content needs no handler state, so skip __init__
+    handler = GoogleADKHandler.__new__(GoogleADKHandler)
+    return lambda *parts: handler._extract_message_content(SimpleNamespace(parts=list(parts)))
+
+
+def test_extract_text_part(extract):
+    assert extract(TextPart(type="text", text="hello")) == "hello"
+
+
+def test_extract_root_model_part(extract):
+    assert extract(Part(TextPart(type="text", text="wrapped"))) == "wrapped"
+
+
+def test_extract_dict_part(extract):
+    assert extract({"type": "text", "text": "plain"}) == "plain"
+    assert extract({"type": "file"}) == ""
+
+
+def test_empty_text_falls_through_to_model_dump(extract):
+    assert extract(DumpOnlyText()) == "from dump"
+    assert extract(TextPart(type="text", text="")) == ""
+
+
+def test_mixed_parts_join_in_order(extract):
+    parts = (
+        TextPart(type="text", text="one"),
+        Part(TextPart(type="text", text="two")),
+        {"text": "three"},
+        object(),
+    )
+    assert extract(*parts) == "one two three"
+
+
+def test_extractor_cached_per_class():
+    first = _part_text_extractor(TextPart(type="text", text="a"))
+    assert _PART_TEXT_EXTRACTORS[TextPart] is first
+    assert _part_text_extractor(TextPart(type="text", text="b")) is first
+    assert _part_text_extractor({"text": "x"}) is not first
+
+
+class ExtraPart(BaseModel):
+    """Part model whose ``text`` only exists on some instances."""
+
+    model_config = ConfigDict(extra="allow")
+
+    type: str = "text"
+
+
+def test_text_less_instance_does_not_hide_later_text(extract):
+    assert extract(SimpleNamespace(kind="file"), SimpleNamespace(text="later")) == "later"
+    assert extract(ExtraPart(), ExtraPart(text="extra")) == "extra"
+    assert _PART_TEXT_EXTRACTORS[SimpleNamespace] is _probe_part_text
+    assert _PART_TEXT_EXTRACTORS[ExtraPart] is _probe_part_text
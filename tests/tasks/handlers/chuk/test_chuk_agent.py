@@ -252,6 +252,20 @@ class TestChukAgent:
             assert client is mock_client
             mock_get_client.assert_called_once_with(provider="openai", model=None)
 
+    @pytest.mark.asyncio
+    async def test_llm_client_reuse(self):
+        """Test that reuse_llm_client builds the LLM client only once."""
+        with patch('a2a_server.tasks.handlers.chuk.chuk_agent.get_client') as mock_get_client:
+            from a2a_server.tasks.handlers.chuk.chuk_agent import ChukAgent
+            
+            mock_get_client.return_value = MockLLMClient()
+            agent = ChukAgent(name="reuse_test", enable_sessions=False, reuse_llm_client=True)
+            
+            first = await agent.get_llm_client()
+            second = await agent.get_llm_client()
+            assert first is second
+            mock_get_client.assert_called_once_with(provider="openai", model=None)
+
     def test_response_content_extraction(self, chuk_agent):
         """Test extraction of content from various response formats."""
         # Test dict response
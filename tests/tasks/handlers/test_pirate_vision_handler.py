@@ -28,6 +28,15 @@ def handler():
     return PirateVisionHandler()
 
 
+@pytest.fixture
+def fast_handler():
+    """Fixture for a PirateVisionHandler with the simulated delays disabled."""
+    handler = PirateVisionHandler()
+    handler.analysis_delay = 0
+    handler.line_delay = 0
+    return handler
+
+
 @pytest.fixture
 def sample_image_message():
     """Fixture for a message containing an image (using text part for now)."""
@@ -193,6 +202,19 @@ class TestPirateVisionHandler:
         # Total duration should be reasonable (< 2 seconds)
         assert event_times[-1] < 2.0
 
+    @pytest.mark.asyncio
+    async def test_zero_delay(self, fast_handler, sample_image_message):
+        """Test that disabling the delays streams the same events without pausing."""
+        start_time = asyncio.get_event_loop().time()
+        
+        events = [
+            event async for event in fast_handler.process_task("test_fast", sample_image_message)
+        ]
+        
+        assert len(events) == 5
+        assert events[-1].status.state == TaskState.completed
+        assert asyncio.get_event_loop().time() - start_time < 0.1
+
     @pytest.mark.asyncio
     async def test_with_text_only_message(self, handler, sample_text_message):
         """Test handler behavior with text-only message (no image)."""